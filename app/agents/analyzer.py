@@ -1,9 +1,9 @@
 import os
 from dotenv import load_dotenv
 
-from app.retriever.vector_utils import get_vectorstore
+from app.retriever.hybrid import get_hybrid_retriever
 from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+from app.utils.llm import get_llm
 from langchain_core.runnables import Runnable
 from langchain_core.output_parsers import StrOutputParser
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -11,10 +11,13 @@ load_dotenv()  # Load OPENAI_API_KEY from .env
 
 
 class AnalyzerAgent:
-    def __init__(self):
-        # ✅ Use shared vector store setup
-        self.vectorstore = get_vectorstore()
-        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 4})
+    def __init__(self, repo: str):
+        # Each repo is indexed into its own collection (see app.retriever.indexer.repo_key); there is no shared one
+        if not repo:
+            raise ValueError("❌ AnalyzerAgent needs the repo key of an indexed repo, e.g. repo_key(repo_path)")
+        # ✅ Shared BM25 + vector retrieval over `repo`'s collection; the vector store loads on first dense query
+        self.repo = repo
+        self.retriever = get_hybrid_retriever(k=4, repo=repo)
 
 
         # Prompt template for the LLM
@@ -33,22 +36,30 @@ class AnalyzerAgent:
         """)
 
         # LLM to generate the analysis
-        self.llm = ChatOpenAI(temperature=0.2, model="gpt-3.5-turbo")
+        self.llm = get_llm(model="gpt-3.5-turbo", temperature=0.2)
 
         # Combine steps into a runnable chain
         self.chain: Runnable = self.prompt | self.llm | StrOutputParser()
 
-    def analyze(self, query: str):
-        """Run the analyzer on a semantic query."""
-        docs = self.retriever.invoke(query)
+    def analyze(self, query: str, file: str = None, block_type=None):
+        """Run the analyzer on a semantic query, optionally narrowed to a file and/or block type(s)."""
+        retriever = self.retriever
+        if file or block_type:
+            retriever = retriever.with_filters(file=file, type=block_type)
+        docs = retriever.invoke(query)
         combined_code = "\n\n".join([doc.page_content for doc in docs])
         return self.chain.invoke({"code": combined_code})
 
 
 # ✅ Test block (for dev only)
 if __name__ == "__main__":
+    import sys
+
+    from app.retriever.indexer import repo_key
+
     print("🤖 Analyzer Agent Starting...")
-    agent = AnalyzerAgent()
+    # Usage: python -m app.agents.analyzer [indexed_repo_path]
+    agent = AnalyzerAgent(repo=repo_key(sys.argv[1] if len(sys.argv) > 1 else "data/repos"))
     response = agent.analyze("Find complex or hard-to-read logic")
     print("\n🔍 ANALYZER OUTPUT:\n")
     print(response)
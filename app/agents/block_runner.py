@@ -0,0 +1,157 @@
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+
+from app.utils.batching import iter_batched, make_batch_chain
+from app.utils.concurrency import astream_blocks, batch_blocks, invoke_block
+from app.utils.dedup import DuplicateIndex, iter_deduped
+from app.utils.file_utils import collect_supported_files
+from app.utils.git_diff import iter_target_blocks
+from app.utils.parser import parse_file_by_type
+from app.utils.results_store import iter_resumed, prompt_version
+
+
+class BlockRunner:
+    """
+    Runs one agent's `{code}` prompt over a repo's blocks.
+
+    The per-block agents (QA, Tester, Documenter) only differ in their
+    prompt and how they print a result; every entry point (streaming,
+    `chain.batch`, async) goes through here, so they all honour the same
+    options: a snapshot, diff mode (`base_ref`), a results `store`,
+    near-duplicate dedup (`dedup_threshold`) and, for the sequential
+    path, request batching (`batch_tokens`).
+    """
+
+    def __init__(self, name, prompt, llm, files_icon="📁"):
+        self.name = name
+        self.prompt = prompt
+        self.llm = llm
+        self.files_icon = files_icon
+        self.chain: Runnable = prompt | llm | StrOutputParser()
+
+    def targets(self, code_dir, max_files, snapshot=None, base_ref=None) -> list:
+        """(file, blocks) pairs to process: the first `max_files` files, or the blocks changed since `base_ref`."""
+        all_files = snapshot.files if snapshot else collect_supported_files(code_dir)
+        print(f"{self.files_icon} Found {len(all_files)} supported files")
+        load_blocks = snapshot.blocks_for if snapshot else parse_file_by_type
+        hunks = snapshot.hunks if snapshot is not None and snapshot.base_ref == base_ref else None
+        return iter_target_blocks(code_dir, all_files, load_blocks, max_files, base_ref, hunks)
+
+    def collect_blocks(self, code_dir, max_files, snapshot=None, base_ref=None) -> list:
+        return [b for _, blocks in self.targets(code_dir, max_files, snapshot, base_ref) for b in blocks]
+
+    def _setup(self, code_dir, targets, store, dedup_threshold, snapshot=None):
+        recorder = None
+        if store:
+            # The snapshot's commit, not the checkout's: another job may have reset it since
+            recorder = store.recorder(code_dir, self.name, prompt_version(self.prompt, self.llm),
+                                      commit=snapshot.commit if snapshot is not None else None)
+        duplicates = None
+        if dedup_threshold:
+            targets = list(targets)
+            duplicates = DuplicateIndex([b for _, blocks in targets for b in blocks], dedup_threshold)
+        return targets, recorder, duplicates
+
+    @staticmethod
+    def _report(recorder):
+        if recorder is not None and recorder.reused:
+            print(f"💾 Reused {recorder.reused} stored results")
+
+    def invoke(self, block) -> dict:
+        return invoke_block(self.chain, block, {"agent": self.name})
+
+    def _run(self, targets, produce, code_dir, store=None, dedup_threshold=None, snapshot=None):
+        targets, recorder, duplicates = self._setup(code_dir, targets, store, dedup_threshold, snapshot)
+        for _, blocks in targets:
+            for result in iter_deduped(duplicates, blocks, lambda todo: iter_resumed(recorder, todo, produce)):
+                # Representatives are recorded by iter_resumed; their copies are filed under each duplicate here
+                if recorder is not None and result.get("duplicate_of"):
+                    recorder.record(result)
+                yield result
+        self._report(recorder)
+
+    def iter_results(self, code_dir="data/repos", max_files=3, snapshot=None, base_ref=None, batch_tokens=None,
+                     store=None, dedup_threshold=None):
+        """
+        Yield one result dict ({block, output, error}) per block, file by file, as soon as it is ready.
+
+        With `batch_tokens`, small blocks of a file share one request of up to
+        that many code tokens; blocks whose answer can't be parsed are retried alone.
+        With a results `store`, blocks already answered for this commit and
+        prompt are served from it and new answers are recorded as they arrive.
+        With `dedup_threshold` (e.g. 0.85), near-identical blocks across the
+        selected files share one LLM answer, cross-referenced in the output.
+        """
+        if batch_tokens:
+            batch_chain = make_batch_chain(self.prompt, self.llm)
+            produce = lambda blocks: iter_batched(self.chain, batch_chain, blocks, budget=batch_tokens)
+        else:
+            produce = lambda blocks: (self.invoke(block) for block in blocks)
+        yield from self._run(self.targets(code_dir, max_files, snapshot, base_ref), produce, code_dir,
+                             store, dedup_threshold, snapshot)
+
+    def run_batched(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None,
+                    store=None, dedup_threshold=None) -> list:
+        """Every block through one `chain.batch` call with bounded concurrency; results in input order."""
+        blocks = self.collect_blocks(code_dir, max_files, snapshot, base_ref)
+        produce = lambda todo: iter(batch_blocks(self.chain, todo, max_concurrency))
+        return list(self._run([(None, blocks)], produce, code_dir, store, dedup_threshold, snapshot))
+
+    async def astream(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None,
+                      store=None, dedup_threshold=None):
+        """
+        Async-iterator variant of iter_results with at most `max_concurrency`
+        calls in flight: results arrive in completion order, tagged with
+        their block's input position as `index`.
+        """
+        blocks = self.collect_blocks(code_dir, max_files, snapshot, base_ref)
+        _, recorder, duplicates = self._setup(code_dir, [(None, blocks)], store, dedup_threshold, snapshot)
+        position = {id(block): i for i, block in enumerate(blocks)}
+
+        def tagged(block, result):
+            copies = []
+            if duplicates is not None:
+                result, copies = duplicates.fan_out(block, result)
+            if recorder is not None:
+                for copy in copies:
+                    recorder.record(copy)
+            for r in [result] + copies:
+                yield {**r, "index": position[id(r["block"])]}
+
+        todo = []
+        for block in blocks:
+            if duplicates is not None and duplicates.representative_of(block) is not None:
+                continue
+            stored = recorder.lookup(block) if recorder is not None else None
+            if stored is None:
+                todo.append(block)
+            else:
+                for result in tagged(block, stored):
+                    yield result
+
+        async for result in astream_blocks(self.chain, todo, max_concurrency, {"agent": self.name}):
+            block = todo[result.pop("index")]
+            if recorder is not None:
+                recorder.record(result)
+            for r in tagged(block, result):
+                yield r
+        self._report(recorder)
+
+    async def ainvoke_all(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None,
+                          store=None, dedup_threshold=None) -> list:
+        """Like `astream`, but return every result once done, in input order."""
+        results = [r async for r in self.astream(code_dir, max_files, max_concurrency, snapshot, base_ref,
+                                                 store, dedup_threshold)]
+        results.sort(key=lambda r: r["index"])
+        return [{k: v for k, v in r.items() if k != "index"} for r in results]
+
+    @staticmethod
+    def print_results(results, format_result, file_header=None):
+        """Print results as the CLI does, with `file_header` (e.g. "📄 File") each time the file changes."""
+        current_file = None
+        for result in results:
+            if file_header and result["block"]["file"] != current_file:
+                current_file = result["block"]["file"]
+                print(f"\n{file_header}: {current_file}")
+            print(format_result(result))
+        return results
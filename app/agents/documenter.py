@@ -2,25 +2,25 @@ import os
 from dotenv import load_dotenv
 from glob import glob
 
-from langchain_openai import ChatOpenAI
-from app.retriever.vector_utils import get_vectorstore
+from app.utils.llm import get_llm
+from app.retriever.hybrid import get_hybrid_retriever
 from langchain.prompts import PromptTemplate
-from langchain_core.runnables import Runnable
 from langchain_core.output_parsers import StrOutputParser
-from app.utils.file_utils import collect_supported_files
+from app.agents.block_runner import BlockRunner
 
 
-from app.utils.parser import parse_file_by_type  # make sure this exists
+from app.utils.parser import parse_file_by_type
+from app.utils.dedup import cross_references
+from app.utils.context_packer import DEFAULT_MODEL, block_priority, context_budget, join_blocks, pack_blocks
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 load_dotenv()
 
 
 class DocumenterAgent:
-    def __init__(self):
-        # Embeddings + vectorstore setup
-        self.vectorstore = get_vectorstore()
-        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 1})
+    def __init__(self, repo: str = None):
+        # Shared BM25 + vector retrieval over `repo`'s collection; the vector store loads on first dense query
+        self.retriever = get_hybrid_retriever(k=1, repo=repo)
 
 
         # Prompt to generate docstrings
@@ -39,37 +39,8 @@ class DocumenterAgent:
         ```
         """)
 
-        self.llm = ChatOpenAI(temperature=0.3, model="gpt-3.5-turbo")
-        self.chain: Runnable = self.prompt | self.llm | StrOutputParser()
-
-    def document_functions(self, code_dir: str = "data/repos", limit: int = 5):
-        all_files = collect_supported_files(code_dir)
-        print(f"📁 Found {len(all_files)} supported files")
-
-        for f in all_files[:limit]:
-            print(f"\n📄 File: {f}")
-            blocks = parse_file_by_type(f)
-
-            for block in blocks:
-                code_snippet = block["code"]
-                try:
-                    docstring = self.chain.invoke({"code": code_snippet})
-                    print(f"\n🔧 {block['type']} `{block['name']}` at line {block['lineno']}")
-                    print(docstring.strip())
-                except Exception as e:
-                    print(f"❌ Failed on {block['name']}: {e}")
-
-                    
-    def summarize_file(self, filepath: str):
-        """Generate a high-level summary of a Python file's purpose and structure."""
-        blocks = parse_file_by_type(filepath)
-        if not blocks:
-            print(f"⚠️ No code blocks found in: {filepath}")
-            return
-
-        full_code = "\n\n".join([block["code"] for block in blocks])
-
-        summary_prompt = PromptTemplate.from_template("""
+        # Prompt for file-level summaries
+        self.summary_prompt = PromptTemplate.from_template("""
         You are a senior software engineer. Given this Python file content, summarize:
 
         - Its purpose
@@ -82,13 +53,62 @@ class DocumenterAgent:
         ```
         """)
 
+        self.llm = get_llm(model="gpt-3.5-turbo", temperature=0.3)
+        # Shared per-block runner: streaming, batched and async entry points all go through it
+        self.runner = BlockRunner("documenter", self.prompt, self.llm)
+        self.chain = self.runner.chain
+
+    def iter_docstrings(self, code_dir: str = "data/repos", limit: int = 5, snapshot=None, base_ref=None, batch_tokens=None, store=None, dedup_threshold=None):
+        """Yield one result dict ({block, output, error}) per block, as soon as it is ready (see BlockRunner.iter_results)."""
+        return self.runner.iter_results(code_dir, limit, snapshot, base_ref, batch_tokens, store, dedup_threshold)
+
+    def aiter_docstrings(self, code_dir: str = "data/repos", limit: int = 5, max_concurrency: int = 8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Async-iterator variant of iter_docstrings: results arrive in completion order, tagged with `index`."""
+        return self.runner.astream(code_dir, limit, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+
+    def document_functions(self, code_dir: str = "data/repos", limit: int = 5, snapshot=None, base_ref=None, batch_tokens=None, store=None, dedup_threshold=None):
+        results = self.iter_docstrings(code_dir, limit, snapshot, base_ref, batch_tokens, store, dedup_threshold)
+        self.runner.print_results(results, self.format_result, "📄 File")
+
+    def document_functions_batched(self, code_dir: str = "data/repos", limit: int = 5, max_concurrency: int = 8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Like document_functions, but runs blocks through `chain.batch` with bounded concurrency."""
+        results = self.runner.run_batched(code_dir, limit, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+        return self.runner.print_results(results, self.format_result)
+
+    async def adocument_functions(self, code_dir: str = "data/repos", limit: int = 5, max_concurrency: int = 8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Async variant of document_functions with at most `max_concurrency` LLM calls in flight."""
+        results = await self.runner.ainvoke_all(code_dir, limit, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+        return self.runner.print_results(results, self.format_result)
+
+    @staticmethod
+    def format_result(result) -> str:
+        """Render one result the way the CLI prints it."""
+        block = result["block"]
+        if result["error"] is not None:
+            return f"❌ Failed on {block['name']}: {result['error']}"
+        return f"\n🔧 {block['type']} `{block['name']}` at line {block['lineno']}{cross_references(result)}\n{result['output']}"
+
+    def summarize_file(self, filepath: str, snapshot=None):
+        """Generate a high-level summary of a Python file's purpose and structure."""
+        blocks = snapshot.blocks_for(filepath) if snapshot else parse_file_by_type(filepath)
+        if not blocks:
+            return f"⚠️ No code blocks found in: {filepath}"
+
+        summary_prompt = self.summary_prompt
+
+        # Keep the most important blocks that fit the context window, in source order
+        model = getattr(self.llm, "model_name", DEFAULT_MODEL)
+        budget = context_budget(model, summary_prompt.template)
+        selected, _ = pack_blocks(sorted(blocks, key=block_priority), budget, model)
+        if len(selected) < len(blocks):
+            print(f"✂️ Summarizing {len(selected)}/{len(blocks)} blocks to fit {budget} tokens")
+        full_code = join_blocks(sorted(selected, key=lambda b: b["lineno"]))
+
         chain = summary_prompt | self.llm | StrOutputParser()
         try:
-            summary = chain.invoke({"code": full_code})
-            print(f"\n📄 File Summary for: {filepath}")
-            print(summary.strip())
+            return chain.invoke({"code": full_code}).strip()
         except Exception as e:
-            print(f"❌ Failed to summarize file: {e}")
+            return f"❌ Failed to summarize file: {e}"
 
 
 if __name__ == "__main__":
@@ -101,5 +121,6 @@ if __name__ == "__main__":
     # File-level summary
     print("\n📘 Generating summary for a single file...\n")
     test_file = "data/repos/psf_requests/requests/sessions.py"  # Use a real one from your repo
-    agent.summarize_file(test_file)
+    print(f"📄 File Summary for: {test_file}")
+    print(agent.summarize_file(test_file))
 
@@ -2,12 +2,10 @@ import os
 from dotenv import load_dotenv
 from glob import glob
 
-from langchain_openai import ChatOpenAI
+from app.utils.llm import get_llm
 from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import Runnable
-from app.utils.file_utils import collect_supported_files
-from app.utils.parser import parse_file_by_type
+from app.agents.block_runner import BlockRunner
+from app.utils.dedup import cross_references
 
 load_dotenv()
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -33,24 +31,40 @@ class QAAgent:
         ```
         """)
 
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2)
-        self.chain: Runnable = self.prompt | self.llm | StrOutputParser()
+        self.llm = get_llm(model="gpt-3.5-turbo", temperature=0.2)
+        # Shared per-block runner: streaming, batched and async entry points all go through it
+        self.runner = BlockRunner("qa", self.prompt, self.llm, files_icon="📁")
+        self.chain = self.runner.chain
 
-    def review_codebase(self, code_dir="data/repos", max_files=3):
-        all_files = collect_supported_files(code_dir)
-        print(f"📁 Found {len(all_files)} supported files")
+    def iter_reviews(self, code_dir="data/repos", max_files=3, snapshot=None, base_ref=None, batch_tokens=None, store=None, dedup_threshold=None):
+        """Yield one result dict ({block, output, error}) per block, as soon as it is ready (see BlockRunner.iter_results)."""
+        return self.runner.iter_results(code_dir, max_files, snapshot, base_ref, batch_tokens, store, dedup_threshold)
 
-        for f in all_files[:max_files]:
-            print(f"\n📄 Reviewing: {f}")
-            blocks = parse_file_by_type(f)
+    def aiter_reviews(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Async-iterator variant of iter_reviews: results arrive in completion order, tagged with `index`."""
+        return self.runner.astream(code_dir, max_files, max_concurrency, snapshot, base_ref, store, dedup_threshold)
 
-            for block in blocks:
-                try:
-                    review = self.chain.invoke({"code": block["code"]})
-                    print(f"\n🔍 {block['type']} `{block['name']}` at line {block['lineno']}")
-                    print(review.strip())
-                except Exception as e:
-                    print(f"❌ Failed to review `{block['name']}`: {e}")
+    def review_codebase(self, code_dir="data/repos", max_files=3, snapshot=None, base_ref=None, batch_tokens=None, store=None, dedup_threshold=None):
+        results = self.iter_reviews(code_dir, max_files, snapshot, base_ref, batch_tokens, store, dedup_threshold)
+        self.runner.print_results(results, self.format_result, "📄 Reviewing")
+
+    def review_codebase_batched(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Like review_codebase, but runs blocks through `chain.batch` with bounded concurrency."""
+        results = self.runner.run_batched(code_dir, max_files, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+        return self.runner.print_results(results, self.format_result)
+
+    async def areview_codebase(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Async variant of review_codebase with at most `max_concurrency` LLM calls in flight."""
+        results = await self.runner.ainvoke_all(code_dir, max_files, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+        return self.runner.print_results(results, self.format_result)
+
+    @staticmethod
+    def format_result(result) -> str:
+        """Render one result the way the CLI prints it."""
+        block = result["block"]
+        if result["error"] is not None:
+            return f"❌ Failed to review `{block['name']}`: {result['error']}"
+        return f"\n🔍 {block['type']} `{block['name']}` at line {block['lineno']}{cross_references(result)}\n{result['output']}"
 
 
 if __name__ == "__main__":
@@ -2,12 +2,13 @@ import os
 from dotenv import load_dotenv
 from glob import glob
 
-from langchain_openai import ChatOpenAI
+from app.utils.llm import get_llm
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import Runnable
 from app.utils.file_utils import collect_supported_files
 from app.utils.parser import parse_file_by_type
+from app.utils.context_packer import DEFAULT_MODEL, context_budget, iter_ranked_blocks, join_blocks, pack_blocks
 
 load_dotenv()
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -34,25 +35,25 @@ class ReadmeAgent:
         ```
         """)
 
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.3)
+        self.llm = get_llm(model="gpt-3.5-turbo", temperature=0.3)
         self.chain: Runnable = self.prompt | self.llm | StrOutputParser()
 
-    def generate_readme(self, code_dir="data/repos", max_blocks=50):
-        all_files = collect_supported_files(code_dir)
+    def generate_readme(self, code_dir="data/repos", max_tokens=None, snapshot=None):
+        all_files = snapshot.files if snapshot else collect_supported_files(code_dir)
         print(f"📁 Found {len(all_files)} supported files in repo")
 
-        all_blocks = []
-        for f in all_files:
-            blocks = parse_file_by_type(f)
-            all_blocks.extend(block["code"] for block in blocks)
+        # Fill the model's context window with the most important blocks first;
+        # files are only read until the budget is full.
+        model = getattr(self.llm, "model_name", DEFAULT_MODEL)
+        budget = max_tokens or context_budget(model, self.prompt.template)
+        load_blocks = snapshot.blocks_for if snapshot else parse_file_by_type
+        selected, used = pack_blocks(iter_ranked_blocks(all_files, load_blocks), budget, model)
 
-
-        if not all_blocks:
+        if not selected:
             return "⚠️ No code blocks found to generate README."
 
-        # Limit total tokens (simple block count cap)
-        full_context = "\n\n".join(all_blocks[:max_blocks])
-        print(f"🧠 Using {min(max_blocks, len(all_blocks))} code blocks for README generation...")
+        full_context = join_blocks(selected)
+        print(f"🧠 Using {len(selected)} code blocks ({used}/{budget} tokens) for README generation...")
 
         try:
             return self.chain.invoke({"code": full_context}).strip()
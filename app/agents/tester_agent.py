@@ -2,12 +2,10 @@ import os
 from dotenv import load_dotenv
 from glob import glob
 
-from langchain_openai import ChatOpenAI
+from app.utils.llm import get_llm
 from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import Runnable
-from app.utils.file_utils import collect_supported_files
-from app.utils.parser import parse_file_by_type
+from app.agents.block_runner import BlockRunner
+from app.utils.dedup import cross_references
 
 load_dotenv()
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -31,24 +29,41 @@ class TesterAgent:
         ```
         """)
 
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2)
-        self.chain: Runnable = self.prompt | self.llm | StrOutputParser()
+        self.llm = get_llm(model="gpt-3.5-turbo", temperature=0.2)
+        # Shared per-block runner: streaming, batched and async entry points all go through it
+        self.runner = BlockRunner("tester", self.prompt, self.llm, files_icon="🧪")
+        self.chain = self.runner.chain
 
-    def generate_tests(self, code_dir="data/repos", max_files=3):
-        all_files = collect_supported_files(code_dir)
-        print(f"🧪 Found {len(all_files)} supported files")
+    def iter_tests(self, code_dir="data/repos", max_files=3, snapshot=None, base_ref=None, batch_tokens=None, store=None, dedup_threshold=None):
+        """Yield one result dict ({block, output, error}) per block, as soon as it is ready (see BlockRunner.iter_results)."""
+        return self.runner.iter_results(code_dir, max_files, snapshot, base_ref, batch_tokens, store, dedup_threshold)
 
-        for f in all_files[:max_files]:
-            print(f"\n📂 Testing file: {f}")
-            blocks = parse_file_by_type(f)
+    def aiter_tests(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Async-iterator variant of iter_tests: results arrive in completion order, tagged with `index`."""
+        return self.runner.astream(code_dir, max_files, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+
+    def generate_tests(self, code_dir="data/repos", max_files=3, snapshot=None, base_ref=None, batch_tokens=None, store=None, dedup_threshold=None):
+        results = self.iter_tests(code_dir, max_files, snapshot, base_ref, batch_tokens, store, dedup_threshold)
+        self.runner.print_results(results, self.format_result, "📂 Testing file")
+
+    def generate_tests_batched(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Like generate_tests, but runs blocks through `chain.batch` with bounded concurrency."""
+        results = self.runner.run_batched(code_dir, max_files, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+        return self.runner.print_results(results, self.format_result)
+
+    async def agenerate_tests(self, code_dir="data/repos", max_files=3, max_concurrency=8, snapshot=None, base_ref=None, store=None, dedup_threshold=None):
+        """Async variant of generate_tests with at most `max_concurrency` LLM calls in flight."""
+        results = await self.runner.ainvoke_all(code_dir, max_files, max_concurrency, snapshot, base_ref, store, dedup_threshold)
+        return self.runner.print_results(results, self.format_result)
+
+    @staticmethod
+    def format_result(result) -> str:
+        """Render one result the way the CLI prints it."""
+        block = result["block"]
+        if result["error"] is not None:
+            return f"❌ Failed to generate test for `{block['name']}`: {result['error']}"
+        return f"\n🧪 Test for {block['type']} `{block['name']}` at line {block['lineno']}:{cross_references(result)}\n\n{result['output']}"
 
-            for block in blocks:
-                try:
-                    test_code = self.chain.invoke({"code": block["code"]})
-                    print(f"\n🧪 Test for {block['type']} `{block['name']}` at line {block['lineno']}:\n")
-                    print(test_code.strip())
-                except Exception as e:
-                    print(f"❌ Failed to generate test for `{block['name']}`: {e}")
 
 if __name__ == "__main__":
     print("🧪 Tester Agent Running...\n")
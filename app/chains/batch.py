@@ -0,0 +1,227 @@
+"""
+Headless batch mode: run the pipeline over many repositories.
+
+    python -m app.chains.batch repos.txt --out batch_output --workers 8
+    python main.py --batch repos.txt           # same thing
+
+`repos.txt` holds one GitHub URL, file:// URL or local path per line
+(blank lines and `#` comments are ignored; "-" reads stdin). Each repo
+gets a folder under `--out` with one file per agent stage and a
+result.json; summary.json lists every repo's status and stage timings.
+The exit code is 1 if any repo had a failed stage.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.chains.review_chain import ALL_AGENTS, build_pipeline, make_agent
+from app.chains.scheduler import format_timings
+from app.utils.llm import set_llm_concurrency
+from app.utils.telemetry import current_context, flush_telemetry, setup_telemetry, span, use_context
+
+# Agent stage -> output file in the repo's folder
+STAGE_FILES = {
+    "analyzer": "analyzer.md",
+    "docstrings": "docstrings.md",
+    "summary": "summary.md",
+    "qa": "qa.md",
+    "tester": "tests.md",
+    "readme": "README.md",
+}
+
+STATUS_ICONS = {"ok": "✅", "failed": "❌", "skipped": "⏭️"}
+
+
+def read_targets(path) -> list:
+    """Repo URLs / paths from a file ("-" for stdin), in order, without duplicates."""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        lines = [line.split("#", 1)[0].strip() for line in f]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return list(dict.fromkeys(line for line in lines if line))
+
+
+def target_slug(target) -> str:
+    """Folder name for a target's outputs."""
+    name = target.split("://", 1)[-1].strip("/").removesuffix(".git")
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_") or "repo"
+
+
+class _SharedAgents:
+    """Agent factory for build_pipeline: repo-independent agents are built once for the whole batch."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = {}
+
+    def __call__(self, kind, repo=None):
+        if repo is not None:  # bound to one repo's collection
+            return make_agent(kind, repo)
+        with self._lock:
+            if kind not in self._agents:
+                self._agents[kind] = make_agent(kind)
+            return self._agents[kind]
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def run_repo(target, out_dir, limits, agents=ALL_AGENTS, max_files=3, base_ref=None, batch_tokens=None,
+             target_dir="data/repos", agent_factory=make_agent, store=None, parent=None, dedup_threshold=None,
+             parse_workers=None) -> dict:
+    """Run the pipeline on one target and write its outputs to `out_dir`; returns its summary record."""
+    os.makedirs(out_dir, exist_ok=True)
+    slug = os.path.basename(out_dir)
+
+    def on_complete(result):
+        detail = f" — {result.error}" if result.error is not None else ""
+        print(f"[{slug}] {STATUS_ICONS[result.status]} {result.name} ({result.seconds:.1f}s){detail}")
+        if result.status == "ok" and result.name in STAGE_FILES and isinstance(result.result, str):
+            _write(os.path.join(out_dir, STAGE_FILES[result.name]), result.result)
+
+    start = time.perf_counter()
+    record = {"target": target, "output_dir": out_dir, "status": "failed", "error": None, "stages": {}}
+    with use_context(parent), span("batch.repo", {"repo.url": target}) as current:
+        try:
+            # Local paths go through the clone stage too: download_github_repo returns them as-is
+            scheduler = build_pipeline(target_dir, max_files=max_files, base_ref=base_ref, repo_url=target,
+                                       agents=agents, on_complete=on_complete,
+                                       batch_tokens=batch_tokens, agent_factory=agent_factory, store=store,
+                                       limits=limits, dedup_threshold=dedup_threshold, parse_workers=parse_workers)
+            results = scheduler.run()
+            record["stages"] = {
+                r.name: {"status": r.status, "seconds": round(r.seconds, 2),
+                         "error": str(r.error) if r.error is not None else None}
+                for r in results.values()
+            }
+            index = results.get("index")
+            if index is not None and index.status == "ok":
+                record["index"] = index.result
+            failed = [r.name for r in results.values() if r.status == "failed"]
+            record["status"] = "failed" if failed else "ok"
+            record["error"] = f"failed stages: {', '.join(failed)}" if failed else None
+            _write(os.path.join(out_dir, "timings.txt"), format_timings(results) + "\n")
+        except Exception as e:
+            record["error"] = str(e)
+        current.set_attribute("batch.status", record["status"])
+
+    record["seconds"] = round(time.perf_counter() - start, 2)
+    _write(os.path.join(out_dir, "result.json"), json.dumps(record, indent=2, default=str))
+    return record
+
+
+def run_batch(targets, output_dir="batch_output", workers=4, clone_concurrency=4, parse_concurrency=2,
+              index_concurrency=2, llm_concurrency=8, agents=ALL_AGENTS, max_files=3, base_ref=None,
+              batch_tokens=None, target_dir="data/repos", resume=True, dedup_threshold=None) -> dict:
+    """
+    Run the pipeline over every target on a pool of `workers` repos at a time.
+
+    Stages of different repos overlap, each kind capped on its own: at most
+    `clone_concurrency` clones (network), `parse_concurrency` parses
+    (CPU; the cores are split between their process pools),
+    `index_concurrency` embedding runs and
+    `llm_concurrency` LLM requests in flight across the whole batch.
+    A failing repo never stops the others. With `resume`, agent outputs
+    go to the results store, so rerunning an interrupted sweep only does
+    what is missing. Returns the summary, also written to summary.json.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    setup_telemetry()
+    set_llm_concurrency(llm_concurrency)
+    limits = {
+        "clone": threading.BoundedSemaphore(max(1, clone_concurrency)),
+        "parse": threading.BoundedSemaphore(max(1, parse_concurrency)),
+        "index": threading.BoundedSemaphore(max(1, index_concurrency)),
+    }
+    store = None
+    if resume:
+        from app.utils.results_store import get_results_store
+
+        store = get_results_store()
+    agent_factory = _SharedAgents()
+    # Each parse runs its own process pool: split the cores so concurrent parses don't oversubscribe them
+    parse_workers = max(1, (os.cpu_count() or 1) // max(1, parse_concurrency))
+
+    print(f"🚀 Batch: {len(targets)} repos, {workers} at a time → {output_dir}")
+    start = time.perf_counter()
+    records = {}
+    with span("batch", {"batch.repos": len(targets), "batch.workers": workers}):
+        parent = current_context()
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-repo") as pool:
+            futures = {}
+            for target in targets:
+                out_dir = os.path.join(output_dir, target_slug(target))
+                futures[pool.submit(run_repo, target, out_dir, limits, agents, max_files, base_ref, batch_tokens,
+                                    target_dir, agent_factory, store, parent, dedup_threshold,
+                                    parse_workers)] = target
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                records[futures[future]] = record
+                icon = "✅" if record["status"] == "ok" else "❌"
+                print(f"{icon} [{done}/{len(targets)}] {record['target']} ({record['seconds']}s)")
+
+    summary = {
+        "repos": len(targets),
+        "ok": sum(r["status"] == "ok" for r in records.values()),
+        "failed": sum(r["status"] != "ok" for r in records.values()),
+        "seconds": round(time.perf_counter() - start, 2),
+        "agents": list(agents),
+        "results": [records[t] for t in targets],
+    }
+    _write(os.path.join(output_dir, "summary.json"), json.dumps(summary, indent=2, default=str))
+    flush_telemetry()
+    print(f"\n📊 {summary['ok']} ok / {summary['failed']} failed in {summary['seconds']}s "
+          f"(see {os.path.join(output_dir, 'summary.json')})")
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="batch", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", help="file with one repo URL or path per line ('-' for stdin)")
+    parser.add_argument("--out", default="batch_output", help="output directory")
+    parser.add_argument("--workers", type=int, default=4, help="repos processed at once")
+    parser.add_argument("--clone-concurrency", type=int, default=4)
+    parser.add_argument("--parse-concurrency", type=int, default=2, help="parses at once; they share the CPU cores")
+    parser.add_argument("--index-concurrency", type=int, default=2)
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="LLM requests in flight, batch-wide")
+    parser.add_argument("--agents", default=",".join(ALL_AGENTS), help="comma-separated subset of: " + ", ".join(ALL_AGENTS))
+    parser.add_argument("--max-files", type=int, default=3)
+    parser.add_argument("--base-ref", default=None, help="only review blocks changed since this ref")
+    parser.add_argument("--batch-tokens", type=int, default=None)
+    parser.add_argument("--target-dir", default="data/repos", help="where repos are cloned")
+    parser.add_argument("--dedup", type=float, default=None, metavar="THRESHOLD",
+                        help="answer near-duplicate blocks once (similarity threshold, e.g. 0.85)")
+    parser.add_argument("--no-resume", action="store_true", help="don't reuse or record stored results")
+    args = parser.parse_args(argv)
+
+    agents = [a.strip() for a in args.agents.split(",") if a.strip()]
+    unknown = [a for a in agents if a not in ALL_AGENTS]
+    if unknown:
+        parser.error(f"unknown agents: {', '.join(unknown)}")
+
+    targets = read_targets(args.targets)
+    if not targets:
+        print("⚠️ No repos to process.")
+        return 0
+
+    summary = run_batch(targets, output_dir=args.out, workers=args.workers,
+                        clone_concurrency=args.clone_concurrency, parse_concurrency=args.parse_concurrency,
+                        index_concurrency=args.index_concurrency, llm_concurrency=args.llm_concurrency,
+                        agents=[a for a in ALL_AGENTS if a in agents], max_files=args.max_files,
+                        base_ref=args.base_ref, batch_tokens=args.batch_tokens, target_dir=args.target_dir,
+                        resume=not args.no_resume, dedup_threshold=args.dedup)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.chains.review_chain import ALL_AGENTS, STAGE_TITLES, build_pipeline, make_agent
+from app.retriever.indexer import repo_key
+from app.utils.github import local_repo_path
+from app.utils.results_store import get_results_store
+
+JOB_DIR = os.path.join(".cache", "jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Per-block results rewrite a job's record at most this often (seconds); stage completions always do
+BLOCK_SAVE_INTERVAL = float(os.getenv("JOB_BLOCK_SAVE_INTERVAL", "1.0"))
+
+ACTIVE = ("queued", "running")
+
+
+def _stage_output(result):
+    """What a finished stage contributes to the persisted job record."""
+    if result.status != "ok" or result.name == "clone":  # the clone path is kept as local_path
+        return None
+    if isinstance(result.result, str):
+        return result.result
+    if isinstance(result.result, dict):  # index stats
+        return result.result
+    return None
+
+
+class JobManager:
+    """
+    Run review pipelines in the background, one job per submitted repo.
+
+    Each job gets an ID and a JSON record under `job_dir` that is rewritten
+    as stages finish (status, per-stage progress events and outputs) and,
+    at most every BLOCK_SAVE_INTERVAL seconds, as the per-block stages
+    produce results. A UI can poll it (live jobs are read from memory, so
+    they show every block at once), survive reruns and reattach by ID later. Jobs run on a
+    small thread pool (`max_workers` repos at once); agents are built once
+    per (kind, repo) and shared by every job, as are the embedding model
+    and vector stores (see app.retriever.vector_utils). Submitting a repo
+    that already has an active job with the same agents returns that job.
+
+    Agent outputs also go to the results store as they are produced,
+    tagged with the job ID; the job records the repo key and commit they
+    are stored under, so an interrupted job's partial results survive and
+    a resubmitted one only runs what is missing.
+
+    Jobs on the same checkout (e.g. same repo, different agents) take
+    turns through clone and parse, which fetch, reset and snapshot that
+    directory; their agent stages still overlap, reading the files, commit
+    and diff captured in the snapshot rather than the checkout.
+    """
+
+    def __init__(self, job_dir=JOB_DIR, max_workers=JOB_WORKERS, target_dir="data/repos", store=None):
+        self.job_dir = job_dir
+        self.target_dir = target_dir
+        self.store = store if store is not None else get_results_store()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="pipeline-job")
+        self._lock = threading.Lock()
+        self._jobs = {}     # job_id -> record (live jobs of this process)
+        self._agents = {}   # (kind, repo) -> agent
+        self._checkout_locks = {}  # local repo path -> lock held from clone through parse
+        self._saved_at = {}        # job_id -> when its record was last written
+        os.makedirs(job_dir, exist_ok=True)
+
+    def agent(self, kind, repo=None):
+        """Shared agent factory handed to build_pipeline."""
+        key = (kind, repo)
+        with self._lock:
+            if key not in self._agents:
+                self._agents[key] = make_agent(kind, repo)
+            return self._agents[key]
+
+    def _checkout_lock(self, repo_url):
+        try:
+            path = os.path.abspath(local_repo_path(repo_url, self.target_dir))
+        except Exception:  # invalid URL: the clone stage reports it
+            path = repo_url
+        with self._lock:
+            return self._checkout_locks.setdefault(path, threading.Lock())
+
+    def _path(self, job_id):
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        self._saved_at[job["id"]] = time.time()
+        tmp_path = self._path(job["id"]) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, default=str)
+        os.replace(tmp_path, self._path(job["id"]))
+
+    def _update(self, job, **fields):
+        with self._lock:
+            job.update(fields, updated_at=time.time())
+            self._save(job)
+
+    def submit(self, repo_url, agents=ALL_AGENTS, max_files=3, base_ref=None, batch_tokens=None) -> str:
+        agents = [a for a in ALL_AGENTS if a in agents]
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] in ACTIVE and job["repo_url"] == repo_url and job["agents"] == agents \
+                        and job["base_ref"] == base_ref:
+                    return job["id"]
+
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "repo_url": repo_url,
+                "agents": agents,
+                "max_files": max_files,
+                "base_ref": base_ref,
+                "status": "queued",
+                "stages": [],        # names, in declaration order, once known
+                "events": [],        # one {stage, status, seconds, error} per finished stage
+                "outputs": {},       # stage -> text (or index stats)
+                "blocks": {},        # running per-block stage -> formatted block results so far
+                "error": None,
+                "repo": None,        # results store key, once parsed
+                "commit": None,
+                "created_at": time.time(),
+                "updated_at": time.time(),
+            }
+            self._jobs[job["id"]] = job
+            self._save(job)
+
+        self._pool.submit(self._run, job, batch_tokens)
+        return job["id"]
+
+    def _run(self, job, batch_tokens):
+        checkout = self._checkout_lock(job["repo_url"])
+        held = []
+
+        def release_checkout():
+            if held:
+                held.pop().release()
+
+        def on_complete(result):
+            event = {"stage": result.name, "title": STAGE_TITLES.get(result.name, result.name),
+                     "status": result.status, "seconds": round(result.seconds, 2),
+                     "error": str(result.error) if result.error is not None else None}
+            with self._lock:
+                job["events"].append(event)
+                output = _stage_output(result)
+                if output is not None:
+                    job["outputs"][result.name] = output
+                    job["blocks"].pop(result.name, None)
+                if result.name == "clone" and result.status == "ok":
+                    job["local_path"] = result.result
+                if result.name == "parse" and result.status == "ok":
+                    job["repo"] = repo_key(result.result.repo_path)
+                    job["commit"] = result.result.commit
+                job["updated_at"] = time.time()
+                self._save(job)
+            # Parse (done, failed or skipped after a failed clone) is the last stage touching the checkout
+            if result.name == "parse":
+                release_checkout()
+
+        def on_result(stage, text, result):
+            with self._lock:
+                job["blocks"].setdefault(stage, []).append(text)
+                job["updated_at"] = time.time()
+                if job["updated_at"] - self._saved_at.get(job["id"], 0.0) >= BLOCK_SAVE_INTERVAL:
+                    self._save(job)
+
+        try:
+            scheduler = build_pipeline(self.target_dir, max_files=job["max_files"], base_ref=job["base_ref"],
+                                       repo_url=job["repo_url"], agents=job["agents"], on_complete=on_complete,
+                                       batch_tokens=batch_tokens, agent_factory=self.agent,
+                                       store=self.store.scoped(job["id"]) if self.store is not None else None,
+                                       on_result=on_result)
+            checkout.acquire()
+            held.append(checkout)
+            self._update(job, status="running", stages=list(scheduler.stages))
+            results = scheduler.run()
+            failed = [r.name for r in results.values() if r.status == "failed"]
+            succeeded = any(r.status == "ok" for r in results.values())
+            self._update(job, status="done" if succeeded else "failed",
+                         error=f"failed stages: {', '.join(failed)}" if failed else None)
+        except Exception as e:
+            self._update(job, status="failed", error=str(e))
+        finally:
+            release_checkout()
+
+    def get(self, job_id):
+        """The job's record (a copy), from memory or disk; None if unknown."""
+        if not job_id or not job_id.isalnum():
+            return None
+        with self._lock:
+            if job_id in self._jobs:
+                return json.loads(json.dumps(self._jobs[job_id], default=str))
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Still marked active on disk but not owned by this process: the server restarted mid-run
+        if job["status"] in ACTIVE:
+            job["status"] = "interrupted"
+        return job
+
+    @staticmethod
+    def progress(job) -> float:
+        """Fraction of stages finished (0..1)."""
+        if job["status"] not in ACTIVE:
+            return 1.0
+        total = len(job["stages"]) or 1
+        return min(1.0, len(job["events"]) / total)
@@ -1,60 +1,287 @@
 import os
-import glob
+import threading
 
-from app.agents.analyzer import AnalyzerAgent
-from app.agents.documenter import DocumenterAgent
-from app.agents.qa_agent import QAAgent
-from app.agents.tester_agent import TesterAgent
-from app.agents.readme_agent import ReadmeAgent
-from app.utils.file_utils import collect_supported_files
+from app.chains.scheduler import StageScheduler, format_timings
+from app.retriever.indexer import index_repository, repo_key
+from app.utils.github import download_github_repo
+from app.utils.llm import set_llm_concurrency
+from app.utils.snapshot import RepoSnapshot
+from app.utils.telemetry import flush_telemetry, setup_telemetry, span
 
+ALL_AGENTS = ("analyzer", "documenter", "qa", "tester", "readme")
 
-def run_pipeline(repo_path="data/repos", max_files=3):
+STAGE_TITLES = {
+    "clone": "⬇️ Clone",
+    "parse": "🧩 Discover + parse",
+    "index": "🗂️ Step 0: Indexing repo into vector store",
+    "analyzer": "🧠 Step 1: Analyzer Agent",
+    "docstrings": "📘 Step 2: Documenter Agent (function-level docstrings)",
+    "summary": "📘 Step 2b: Documenter Agent (file-level summary)",
+    "qa": "🧪 Step 3: QA Agent",
+    "tester": "🧬 Step 4: Tester Agent",
+    "readme": "📄 Step 5: README Agent",
+}
+
+# Stages that publish each block's result through `on_result` as it is ready
+PER_BLOCK_STAGES = ("docstrings", "qa", "tester")
+
+
+def make_agent(kind, repo=None):
+    """
+    Default agent factory for build_pipeline: a fresh agent per stage.
+
+    Agent modules (and through them langchain, the OpenAI SDK and the
+    vector store) are imported here, by the stage that needs them, so
+    importing this module and unused stages stay cheap.
+    """
+    if kind == "analyzer":
+        from app.agents.analyzer import AnalyzerAgent
+        return AnalyzerAgent(repo=repo)
+    if kind == "documenter":
+        from app.agents.documenter import DocumenterAgent
+        return DocumenterAgent(repo=repo)
+    if kind == "qa":
+        from app.agents.qa_agent import QAAgent
+        return QAAgent()
+    if kind == "tester":
+        from app.agents.tester_agent import TesterAgent
+        return TesterAgent()
+    if kind == "readme":
+        from app.agents.readme_agent import ReadmeAgent
+        return ReadmeAgent()
+    raise ValueError(f"Unknown agent: {kind}")
+
+
+def _stored(store, repo_path, name, prompt, llm, fn, key=None, commit=None):
+    """
+    `fn()`, or its stored output when `store` has one for `commit` (default:
+    the checkout's HEAD), prompt and `key` (a digest of the content `fn`
+    reads, so uncommitted edits or a checkout outside git don't serve stale
+    output).
+    """
+    if store is None:
+        return fn()
+    from app.utils.results_store import REPO_LEVEL, prompt_version
+
+    recorder = store.recorder(repo_path, name, prompt_version(prompt, llm), commit=commit)
+    return recorder.once(fn, key=key or REPO_LEVEL)
+
+
+def _summarize_first_file(snapshot, agent_factory=make_agent, store=None):
+    # The summary prompt is for Python files
+    filepath = next((f for f in snapshot.files if f.endswith(".py")), None)
+    if filepath is None:
+        return "⚠️ No Python files found for summary."
+    agent = agent_factory("documenter", repo_key(snapshot.repo_path))
+    summary = _stored(store, snapshot.repo_path, "summary", agent.summary_prompt, agent.llm,
+                      lambda: agent.summarize_file(filepath=filepath, snapshot=snapshot),
+                      key=f"{os.path.relpath(filepath, snapshot.repo_path)}@{snapshot.file_digest(filepath)}",
+                      commit=snapshot.commit)
+    return f"📄 File Summary for: {filepath}\n{summary}"
+
+
+def _limited(fn, limit):
+    """Wrap a stage function so it runs while holding `limit` (a semaphore), if any."""
+    if limit is None:
+        return fn
+
+    def run(*args):
+        with limit:
+            return fn(*args)
+    return run
+
+
+def _render(agent, results, stage, on_result=None):
+    """The stage's output text; each block's result also goes to `on_result(stage, text, result)` as it arrives."""
+    lines = []
+    for result in results:
+        text = agent.format_result(result)
+        if on_result is not None:
+            on_result(stage, text, result)
+        lines.append(text)
+    return "\n".join(lines)
+
+
+def build_pipeline(repo_path="data/repos", max_files=3, parse_mode="flat", base_ref=None, repo_url=None,
+                   agents=ALL_AGENTS, max_workers=6, on_complete=None, batch_tokens=None,
+                   agent_factory=make_agent, store=None, limits=None, dedup_threshold=None,
+                   parse_workers=None, on_result=None) -> StageScheduler:
+    """
+    Declare the pipeline as a stage DAG: [clone →] parse → index → agents.
+
+    With `repo_url`, a clone stage downloads into `repo_path` (as target dir)
+    first. Every agent stage depends only on what it reads, so they all run
+    concurrently once the snapshot is built; the analyzer also waits for
+    the index and only retrieves from this repo's collection. Agent stages
+    return their rendered output text. `agent_factory(kind, repo)` supplies
+    the agents, so long-lived callers can reuse them across runs. With a
+    results `store` (app.utils.results_store), every agent skips work whose
+    output is already stored for this commit and prompt version, so a
+    rerun after a crash only does what is left.
+
+    `limits` optionally maps "clone", "parse" and "index" to semaphores
+    shared by several pipelines (see app.chains.batch), so each kind of
+    work gets its own cap; LLM stages are bounded by the global LLM budget.
+    `parse_workers` sizes the parse stage's process pool (default: CPU count).
+    `dedup_threshold` makes the per-block agents answer near-duplicate
+    blocks once (see app.utils.dedup). `on_result(stage, text, result)` is
+    called from the stage's thread with each block result (formatted and
+    raw) of the per-block stages (PER_BLOCK_STAGES) as soon as it is ready.
+    """
+    scheduler = StageScheduler(max_workers=max_workers, on_complete=on_complete)
+    limits = limits or {}
+
+    if repo_url:
+        scheduler.add("clone", _limited(lambda: download_github_repo(repo_url, target_dir=repo_path),
+                                        limits.get("clone")))
+        # Walk + parse once; every agent reads from this snapshot.
+        # "flat" mode sends each line of a class to the LLM once (skeleton + methods).
+        # The diff is read here too, while the checkout is known to match the snapshot
+        scheduler.add("parse", _limited(lambda path: RepoSnapshot.build(path, mode=parse_mode, workers=parse_workers,
+                                                                        base_ref=base_ref),
+                                        limits.get("parse")),
+                      deps=["clone"])
+    else:
+        scheduler.add("parse", _limited(lambda: RepoSnapshot.build(repo_path, mode=parse_mode, workers=parse_workers,
+                                                                   base_ref=base_ref),
+                                        limits.get("parse")))
+
+    if "analyzer" in agents or "documenter" in agents:
+        # Embeds only new/changed blocks
+        scheduler.add("index", _limited(lambda snap: index_repository(snap.repo_path, snapshot=snap),
+                                        limits.get("index")), deps=["parse"])
+
+    if "analyzer" in agents:
+        def analyzer(snap, _):
+            agent = agent_factory("analyzer", repo_key(snap.repo_path))
+            return _stored(store, snap.repo_path, "analyzer", agent.prompt, agent.llm,
+                           lambda: agent.analyze("Find logic issues or code smells"), key=snap.digest,
+                           commit=snap.commit)
+
+        scheduler.add("analyzer", analyzer, deps=["parse", "index"])
+
+    if "documenter" in agents:
+        def docstrings(snap):
+            agent = agent_factory("documenter", repo_key(snap.repo_path))
+            results = agent.iter_docstrings(snap.repo_path, max_files, snapshot=snap, base_ref=base_ref,
+                                            batch_tokens=batch_tokens, store=store, dedup_threshold=dedup_threshold)
+            return _render(agent, results, "docstrings", on_result)
+
+        scheduler.add("docstrings", docstrings, deps=["parse"])
+        scheduler.add("summary", lambda snap: _summarize_first_file(snap, agent_factory, store), deps=["parse"])
+
+    if "qa" in agents:
+        def qa(snap):
+            agent = agent_factory("qa")
+            results = agent.iter_reviews(snap.repo_path, max_files, snapshot=snap, base_ref=base_ref,
+                                         batch_tokens=batch_tokens, store=store, dedup_threshold=dedup_threshold)
+            return _render(agent, results, "qa", on_result)
+
+        scheduler.add("qa", qa, deps=["parse"])
+
+    if "tester" in agents:
+        def tester(snap):
+            agent = agent_factory("tester")
+            results = agent.iter_tests(snap.repo_path, max_files, snapshot=snap, base_ref=base_ref,
+                                       batch_tokens=batch_tokens, store=store, dedup_threshold=dedup_threshold)
+            return _render(agent, results, "tester", on_result)
+
+        scheduler.add("tester", tester, deps=["parse"])
+
+    # The README is repo-wide, so it is skipped in diff mode
+    if "readme" in agents and base_ref is None:
+        def readme(snap):
+            agent = agent_factory("readme")
+            return _stored(store, snap.repo_path, "readme", agent.prompt, agent.llm,
+                           lambda: agent.generate_readme(snap.repo_path, snapshot=snap), key=snap.digest,
+                           commit=snap.commit)
+
+        scheduler.add("readme", readme, deps=["parse"])
+
+    return scheduler
+
+
+class _BlockPrinter:
+    """CLI `on_result`: prints each block as it arrives, under a header whenever the stage or file changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # per-block stages run concurrently
+        self._current = None
+
+    def __call__(self, stage, text, result):
+        where = (stage, result["block"].get("file"))
+        with self._lock:
+            if where != self._current:
+                self._current = where
+                print(f"\n{STAGE_TITLES.get(stage, stage)} · 📄 {where[1]}")
+            print(text)
+
+
+def _print_stage(result):
+    title = STAGE_TITLES.get(result.name, result.name)
+    if result.status == "failed":
+        print(f"\n{title}\n❌ Failed after {result.seconds:.1f}s: {result.error}")
+    elif result.status == "skipped":
+        print(f"\n{title}\n⏭️ Skipped: {result.error}")
+    elif result.name in PER_BLOCK_STAGES:  # its blocks were printed as they arrived
+        print(f"\n{title} ✅ done ({result.seconds:.1f}s)")
+    elif isinstance(result.result, str):
+        print(f"\n{title} ({result.seconds:.1f}s)\n")
+        print(result.result)
+
+
+def run_pipeline(repo_path="data/repos", max_files=3, parse_mode="flat", base_ref=None, repo_url=None,
+                 max_workers=6, llm_concurrency=8, batch_tokens=None, resume=True, dedup_threshold=None):
+    """
+    Run every agent over `repo_path`.
+
+    Independent stages run concurrently (at most `max_workers`), sharing a
+    global budget of `llm_concurrency` LLM requests in flight. A failed
+    stage only skips the stages that depend on it. With `base_ref`
+    (e.g. "origin/main") the per-block agents only see the functions and
+    classes touched since that ref, and the repo-wide README step is skipped.
+    `batch_tokens` opts into packing small blocks into shared requests.
+    With `resume` (the default), outputs are recorded in the results store
+    as they are produced and reused on the next run of the same commit;
+    RESULTS_STORE_DISABLED=1 turns this off globally. `dedup_threshold`
+    (e.g. 0.85) sends one block per group of near-duplicates to the LLM.
+    Set TELEMETRY_EXPORTER=console|json to export spans and metrics
+    (see app.utils.telemetry).
+    """
     print("🚀 Running Codebase Companion Full Agent Pipeline")
-    print(f"📁 Target repo: {repo_path}\n")
+    print(f"📁 Target repo: {repo_url or repo_path}\n")
 
     # Validate repo path
-    if not os.path.exists(repo_path):
+    if not repo_url and not os.path.exists(repo_path):
         print(f"❌ Repo path not found: {repo_path}")
         return
 
-    # Analyzer
-    print("\n🧠 Step 1: Analyzer Agent")
-    analyzer = AnalyzerAgent()
-    analyzer.analyze("Find logic issues or code smells")
-
-    # Documenter — function level
-    print("\n📘 Step 2: Documenter Agent (function-level docstrings)")
-    documenter = DocumenterAgent()
-    documenter.document_functions(code_dir=repo_path, limit=max_files)
-
-    # Documenter — file-level
-    print("\n📘 Step 2b: Documenter Agent (file-level summary)")
-    all_files = collect_supported_files(repo_path)
-    if all_files:
-        documenter.summarize_file(filepath=all_files[0])
-    else:
-        print("⚠️ No supported files found for summary.")
+    setup_telemetry()
+    set_llm_concurrency(llm_concurrency)
+    from app.utils.results_store import get_results_store
 
+    store = get_results_store() if resume else None
+    scheduler = build_pipeline(repo_path, max_files=max_files, parse_mode=parse_mode, base_ref=base_ref,
+                               repo_url=repo_url, max_workers=max_workers, on_complete=_print_stage,
+                               batch_tokens=batch_tokens, store=store, dedup_threshold=dedup_threshold,
+                               on_result=_BlockPrinter())
+    with span("pipeline", {"repo.url": repo_url, "repo.path": repo_path, "base_ref": base_ref}) as current:
+        results = scheduler.run()
+        current.set_attribute("stages.failed", sum(r.status == "failed" for r in results.values()))
 
-    # QA
-    print("\n🧪 Step 3: QA Agent")
-    qa = QAAgent()
-    qa.review_codebase(code_dir=repo_path, max_files=max_files)
+    print("\n⏱️ Stage timings:")
+    print(format_timings(results))
 
-    # Tester
-    print("\n🧬 Step 4: Tester Agent")
-    tester = TesterAgent()
-    tester.generate_tests(code_dir=repo_path, max_files=max_files)
+    from app.utils.llm_cache import get_llm_cache
 
-    # README
-    print("\n📄 Step 5: README Agent")
-    readme = ReadmeAgent()
-    readme_md = readme.generate_readme(code_dir=repo_path)
-    print("\n📄 Generated README:\n")
-    print(readme_md)
+    cache = get_llm_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"\n💾 LLM cache: {stats['hits']} hits / {stats['misses']} misses ({stats['entries']} entries)")
 
+    flush_telemetry()
     print("\n✅ Pipeline Completed.")
+    return results
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app.utils.telemetry import current_context, mark_error, span, use_context
+
+
+class Stage:
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+class StageResult:
+    def __init__(self, name, status, result=None, error=None, seconds=0.0):
+        self.name = name
+        self.status = status  # "ok" | "failed" | "skipped"
+        self.result = result
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"StageResult({self.name!r}, {self.status!r}, {self.seconds:.2f}s)"
+
+
+class StageScheduler:
+    """
+    Run a small DAG of pipeline stages on a thread pool.
+
+    Each stage's function is called with its dependencies' results as
+    positional arguments, in `deps` order, as soon as all of them have
+    succeeded. Independent stages run concurrently (up to `max_workers`).
+    A failing stage is recorded and only its dependents are skipped; the
+    rest of the graph keeps going. `on_complete(StageResult)` fires from
+    the scheduling thread as each stage finishes.
+    """
+
+    def __init__(self, max_workers=4, on_complete=None):
+        self.max_workers = max_workers
+        self.on_complete = on_complete
+        self.stages = {}
+
+    def add(self, name, fn, deps=()):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = Stage(name, fn, deps)
+        return self
+
+    @staticmethod
+    def _timed(stage, args, parent=None):
+        start = time.perf_counter()
+        # Worker threads don't inherit the caller's trace context, so stage spans are re-parented explicitly
+        with use_context(parent), span(f"stage.{stage.name}"):
+            try:
+                return StageResult(stage.name, "ok", result=stage.fn(*args), seconds=time.perf_counter() - start)
+            except Exception as e:
+                mark_error(e)
+                return StageResult(stage.name, "failed", error=e, seconds=time.perf_counter() - start)
+
+    def _finish(self, results, result):
+        results[result.name] = result
+        if self.on_complete:
+            self.on_complete(result)
+
+    def run(self) -> dict:
+        """Execute every stage and return {name: StageResult} in declaration order."""
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        parent = current_context()
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    dep_results = [results.get(dep) for dep in stage.deps]
+                    if any(r is not None and r.status != "ok" for r in dep_results):
+                        del pending[name]
+                        failed = next(r.name for r in dep_results if r is not None and r.status != "ok")
+                        self._finish(results, StageResult(name, "skipped", error=f"dependency '{failed}' did not succeed"))
+                    elif all(r is not None for r in dep_results):
+                        del pending[name]
+                        running[pool.submit(self._timed, stage, [r.result for r in dep_results], parent)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    self._finish(results, future.result())
+
+        return {name: results[name] for name in self.stages}
+
+
+def format_timings(results: dict) -> str:
+    lines = []
+    for r in results.values():
+        icon = {"ok": "✅", "failed": "❌", "skipped": "⏭️"}[r.status]
+        detail = f" ({r.error})" if r.error is not None else ""
+        lines.append(f"{icon} {r.name:<12} {r.seconds:6.2f}s{detail}")
+    return "\n".join(lines)
@@ -0,0 +1,83 @@
+from typing import Any, Callable, Optional
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.retriever.lexical_index import get_lexical_index, is_identifier_query
+from app.retriever.vector_utils import get_vectorstore, to_chroma_where
+from app.utils.telemetry import count, span
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuse BM25 and dense retrieval with reciprocal rank fusion.
+
+    Identifier-shaped queries (`parse_file_by_type`, `QAAgent.review_codebase`)
+    that hit the lexical index are answered from it alone, so they never
+    touch the embedding model. The vector store is only built on the first
+    query that needs it.
+
+    `where` ({field: value | [values]} over repo/file/type/name/...) is
+    pushed into both the BM25 scan and the Chroma query, so filtering
+    happens before ranking rather than on the top-k afterwards.
+    """
+
+    lexical: Any
+    vectorstore_factory: Callable[[], Any]
+    k: int = 4
+    candidates: int = 20
+    rrf_k: int = 60
+    where: Optional[dict] = None
+
+    def _lexical_docs(self, query):
+        hits = self.lexical.search(query, k=self.candidates, where=self.where)
+        return [Document(page_content=self.lexical.docs[doc_id][0], metadata=self.lexical.docs[doc_id][1], id=doc_id)
+                for doc_id, _ in hits]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        with span("retrieve", {"retrieval.k": self.k, "query.chars": len(query)}) as current:
+            docs, mode = self._retrieve(query)
+            current.set_attributes({"retrieval.mode": mode, "retrieval.results": len(docs)})
+        count("retrieval.results", len(docs), {"retrieval.mode": mode})
+        return docs
+
+    def _retrieve(self, query):
+        lexical_docs = self._lexical_docs(query)
+        if lexical_docs and is_identifier_query(query):
+            return lexical_docs[:self.k], "lexical"
+
+        with span("retrieve.dense", {"retrieval.candidates": self.candidates}):
+            vector_docs = self.vectorstore_factory().similarity_search(query, k=self.candidates,
+                                                                       filter=to_chroma_where(self.where))
+
+        scores, docs = {}, {}
+        for ranking in (lexical_docs, vector_docs):
+            for rank, doc in enumerate(ranking):
+                key = doc.id or hash(doc.page_content)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                docs.setdefault(key, doc)
+
+        best = sorted(scores, key=lambda key: -scores[key])[:self.k]
+        return [docs[key] for key in best], "hybrid"
+
+    def with_filters(self, **filters) -> "HybridRetriever":
+        """Copy narrowed by extra metadata filters, e.g. `with_filters(type=["FunctionDef", "ClassDef"])`."""
+        where = dict(self.where or {})
+        where.update({k: v for k, v in filters.items() if v is not None})
+        return self.model_copy(update={"where": where or None})
+
+
+def get_hybrid_retriever(k=4, persist_directory="chroma_db", repo=None, where=None) -> HybridRetriever:
+    """
+    Hybrid retriever over one repo's collection (or the shared default one).
+
+    With `repo`, only that repo's Chroma collection and lexical index are
+    searched, so cost scales with the target repo and results cannot leak
+    in from other indexed repos.
+    """
+    return HybridRetriever(
+        lexical=get_lexical_index(persist_directory, repo=repo),
+        vectorstore_factory=lambda: get_vectorstore(persist_directory=persist_directory, repo=repo),
+        k=k,
+        where=where,
+    )
@@ -0,0 +1,134 @@
+import hashlib
+import os
+
+from app.retriever.lexical_index import get_lexical_index
+from app.retriever.vector_utils import get_vectorstore
+from app.utils.file_utils import collect_supported_files
+from app.utils.parser import parse_file_by_type
+from app.utils.telemetry import count, span
+
+# Chroma rejects very large add() calls, so upserts are chunked
+ADD_BATCH_SIZE = 256
+
+
+def repo_key(repo_path: str) -> str:
+    """
+    Name a repo by its checkout: folder name plus a hash of the absolute path,
+    e.g. data/repos/psf_requests -> psf_requests-1a2b3c4d5e. Same-named
+    checkouts in different places get separate collections and index entries.
+    """
+    repo_path = os.path.abspath(repo_path)
+    digest = hashlib.sha1(repo_path.encode("utf-8")).hexdigest()[:10]
+    return f"{os.path.basename(repo_path)}-{digest}"
+
+
+def content_hash(code: str) -> str:
+    return hashlib.sha1(code.encode("utf-8")).hexdigest()
+
+
+def block_id(repo: str, relpath: str, block: dict, digest: str) -> str:
+    """Stable vector ID derived from (repo, file, symbol, content hash)."""
+    symbol = f"{block['type']}:{block['name']}"
+    return hashlib.sha1(f"{repo}|{relpath}|{symbol}|{digest}".encode("utf-8")).hexdigest()
+
+
+def build_index_entries(repo_path: str, repo: str = None, snapshot=None) -> dict:
+    """Parse a repo (or read a prebuilt snapshot) and return {id: (text, metadata)} per non-empty block."""
+    repo = repo or repo_key(repo_path)
+    entries = {}
+
+    for f in (snapshot.files if snapshot else collect_supported_files(repo_path)):
+        relpath = os.path.relpath(f, repo_path)
+        try:
+            blocks = snapshot.blocks_for(f) if snapshot else parse_file_by_type(f)
+        except Exception as e:
+            print(f"⚠️ Skipping {relpath}: {e}")
+            continue
+
+        for block in blocks:
+            code = block.get("code")
+            if not code or not code.strip():
+                continue
+
+            digest = content_hash(code)
+            base_id = block_id(repo, relpath, block, digest)
+
+            # Identical symbols in one file (e.g. two equal __init__) get an occurrence suffix
+            doc_id, n = base_id, 1
+            while doc_id in entries:
+                doc_id = f"{base_id}-{n}"
+                n += 1
+
+            metadata = {
+                "repo": repo,
+                "file": relpath,
+                "name": block["name"],
+                "type": block["type"],
+                "lineno": block["lineno"],
+                "source": block["source"],
+                "content_hash": digest,
+            }
+            # Chroma metadata cannot hold None, so optional fields are only set when present
+            for key in ("end_lineno", "qualname", "parent"):
+                if block.get(key) is not None:
+                    metadata[key] = block[key]
+            entries[doc_id] = (code, metadata)
+    return entries
+
+
+def index_repository(repo_path: str, repo: str = None, vectorstore=None, snapshot=None, lexical=None) -> dict:
+    """
+    Incrementally sync a repo's parsed blocks into its own Chroma collection
+    and the lexical (BM25) index stored beside it.
+
+    Only blocks whose ID is not yet stored get embedded; IDs that no longer
+    exist in the checkout are deleted. Returns added/deleted/unchanged counts.
+    """
+    repo = repo or repo_key(repo_path)
+    with span("index", {"repo": repo}) as current:
+        vectorstore = vectorstore or get_vectorstore(repo=repo)
+        lexical = lexical or get_lexical_index(repo=repo)
+
+        entries = build_index_entries(repo_path, repo=repo, snapshot=snapshot)
+        existing = set(vectorstore.get(where={"repo": repo}, include=[])["ids"])
+
+        to_add = [doc_id for doc_id in entries if doc_id not in existing]
+        to_delete = [doc_id for doc_id in existing if doc_id not in entries]
+
+        if to_delete:
+            vectorstore.delete(ids=to_delete)
+
+        for i in range(0, len(to_add), ADD_BATCH_SIZE):
+            batch = to_add[i:i + ADD_BATCH_SIZE]
+            with span("embed", {"repo": repo, "blocks": len(batch)}):
+                vectorstore.add_texts(
+                    texts=[entries[doc_id][0] for doc_id in batch],
+                    metadatas=[entries[doc_id][1] for doc_id in batch],
+                    ids=batch,
+                )
+            count("blocks.embedded", len(batch))
+
+        # The lexical index is synced on its own so it also catches up with blocks
+        # embedded before it existed; this never calls the embedding model.
+        lexical_ids = set(lexical.ids(where={"repo": repo}))
+        for doc_id in lexical_ids - entries.keys():
+            lexical.remove(doc_id)
+        for doc_id in entries.keys() - lexical_ids:
+            lexical.add(doc_id, *entries[doc_id])
+        lexical.save()
+        current.set_attributes({"blocks": len(entries), "blocks.added": len(to_add), "blocks.deleted": len(to_delete)})
+
+    stats = {
+        "added": len(to_add),
+        "deleted": len(to_delete),
+        "unchanged": len(entries) - len(to_add),
+    }
+    print(f"🗂️ Indexed {repo}: +{stats['added']} / -{stats['deleted']} / ={stats['unchanged']} blocks")
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "data/repos"
+    index_repository(target)
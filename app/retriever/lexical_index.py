@@ -0,0 +1,148 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+IDENTIFIER_QUERY_RE = re.compile(r"^[A-Za-z_][\w.]*$")
+
+INDEX_FILENAME = "lexical_index.json"
+
+
+def _matches(metadata, where):
+    """Equality per key; list/tuple/set values mean "any of"."""
+    for key, value in where.items():
+        if isinstance(value, (list, tuple, set)):
+            if metadata.get(key) not in value:
+                return False
+        elif metadata.get(key) != value:
+            return False
+    return True
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased identifiers plus their snake_case / camelCase parts."""
+    tokens = []
+    for word in WORD_RE.findall(text):
+        lower = word.lower()
+        tokens.append(lower)
+        parts = [p.lower() for piece in word.split("_") for p in CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def is_identifier_query(query: str) -> bool:
+    """True for queries like `parse_python_file` or `AnalyzerAgent.analyze`."""
+    return bool(IDENTIFIER_QUERY_RE.match(query.strip()))
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over parsed blocks.
+
+    Only (text, metadata) per document is persisted, as JSON next to the
+    Chroma collection; postings are rebuilt on load. Documents are added
+    and removed one by one so the indexer can keep it in step with Chroma.
+    """
+
+    def __init__(self, path=None, k1=1.2, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.docs = {}                       # id -> (text, metadata)
+        self.lengths = {}                    # id -> token count
+        self.postings = defaultdict(dict)    # term -> {id: term frequency}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, persist_directory, collection_name=None):
+        filename = f"lexical_{collection_name}.json" if collection_name else INDEX_FILENAME
+        index = cls(os.path.join(persist_directory, filename))
+        try:
+            with open(index.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        for doc_id, (text, metadata) in data.items():
+            index.add(doc_id, text, metadata)
+        return index
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.docs, f)
+        os.replace(tmp_path, self.path)
+
+    def add(self, doc_id, text, metadata=None):
+        with self._lock:
+            if doc_id in self.docs:
+                self.remove(doc_id)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings[term][doc_id] = tf
+            self.docs[doc_id] = (text, metadata or {})
+            self.lengths[doc_id] = sum(counts.values())
+            self.total_length += self.lengths[doc_id]
+
+    def remove(self, doc_id):
+        with self._lock:
+            if doc_id not in self.docs:
+                return
+            text, _ = self.docs.pop(doc_id)
+            for term in set(tokenize(text)):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self.postings[term]
+            self.total_length -= self.lengths.pop(doc_id)
+
+    def ids(self, where=None):
+        """IDs whose metadata matches `where` ({field: value | [values]})."""
+        with self._lock:
+            return [doc_id for doc_id, (_, meta) in self.docs.items() if not where or _matches(meta, where)]
+
+    def search(self, query: str, k=4, where=None) -> list:
+        """Top-k (doc_id, score) pairs by BM25, optionally filtered on metadata ({field: value | [values]})."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self.docs)
+            if not n or not terms:
+                return []
+            avg_length = self.total_length / n
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if where:
+                scores = {d: s for d, s in scores.items() if _matches(self.docs[d][1], where)}
+            return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+_lock = threading.Lock()
+_indexes = {}  # (persist_directory, repo) -> LexicalIndex
+
+
+def get_lexical_index(persist_directory="chroma_db", repo=None):
+    """Shared lexical index stored beside the (per-repo) Chroma collection in `persist_directory`."""
+    from app.retriever.vector_utils import collection_name_for
+
+    key = (persist_directory, repo)
+    with _lock:
+        if key not in _indexes:
+            _indexes[key] = LexicalIndex.load(persist_directory, collection_name_for(repo) if repo else None)
+        return _indexes[key]
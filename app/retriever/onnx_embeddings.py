@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import onnxruntime as ort
+from huggingface_hub import hf_hub_download
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Torch-free embeddings for BGE-style models, run through onnxruntime.
+
+    Uses the model's exported `onnx/model.onnx` and `tokenizer.json` from the
+    Hugging Face Hub, CLS pooling and L2 normalisation (as the
+    sentence-transformers pipeline for bge-small-en-v1.5 does). Texts are
+    sorted by token length and batched so padding stays minimal; results
+    are returned in input order. `quantize=True` runs a dynamically
+    int8-quantised copy of the model, built once and cached beside it.
+    """
+
+    def __init__(self, model_name="BAAI/bge-small-en-v1.5", batch_size=32, max_length=512,
+                 quantize=False, num_threads=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+        tokenizer_path = hf_hub_download(model_name, "tokenizer.json")
+        model_path = hf_hub_download(model_name, "onnx/model.onnx")
+        if quantize:
+            model_path = self._quantized(model_path)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def _quantized(model_path):
+        quant_path = model_path.replace(".onnx", ".int8.onnx")
+        if not os.path.exists(quant_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(model_path, quant_path, weight_type=QuantType.QInt8)
+        return quant_path
+
+    def _encode_batch(self, encodings):
+        width = max(len(e.ids) for e in encodings)
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        for row, e in enumerate(encodings):
+            ids[row, :len(e.ids)] = e.ids
+            mask[row, :len(e.ids)] = 1
+
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = self.session.run(None, feeds)[0]
+        cls = hidden[:, 0]
+        return cls / np.clip(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(list(texts))
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            chunk = order[start:start + self.batch_size]
+            for i, vector in zip(chunk, self._encode_batch([encodings[i] for i in chunk])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -1,8 +1,114 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-
-def get_vectorstore(persist_directory="chroma_db", model_name="BAAI/bge-small-en-v1.5"):
-    embedding_model = HuggingFaceEmbeddings(model_name=model_name)
-    vectorstore = Chroma(persist_directory=persist_directory, embedding_function=embedding_model)
-    return vectorstore
- 
\ No newline at end of file
+import hashlib
+import os
+import re
+import sys
+import threading
+
+# "onnx" runs the model through onnxruntime (no torch import); "torch" uses sentence-transformers;
+# "fake" is a deterministic hash embedding for offline benchmarks (no model download)
+DEFAULT_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")
+
+# Process-wide registry. Lives at module level so it is shared by every agent
+# and survives Streamlit reruns (imported modules are not re-executed).
+_lock = threading.Lock()
+_embeddings = {}    # (backend, model_name) -> embeddings
+_vectorstores = {}  # (backend, model_name, persist_directory, collection_name) -> Chroma
+
+# langchain_chroma's collection when no repo is given
+DEFAULT_COLLECTION = "langchain"
+
+
+def collection_name_for(repo=None) -> str:
+    """Chroma collection holding one repo's blocks (names: 3-63 chars of [a-zA-Z0-9._-])."""
+    if not repo:
+        return DEFAULT_COLLECTION
+    slug = re.sub(r"[^a-zA-Z0-9._-]+", "-", repo).strip("._-")
+    name = f"repo-{slug}"
+    if len(name) > 63:
+        name = f"{name[:54]}-{hashlib.sha1(repo.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+def to_chroma_where(filters):
+    """
+    Turn {field: value | [values]} into a Chroma `where` clause.
+
+    Lists become `$in`, and several fields are combined with `$and`.
+    """
+    if not filters:
+        return None
+    clauses = [{k: {"$in": list(v)} if isinstance(v, (list, tuple, set)) else v} for k, v in filters.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _load_embeddings(model_name, backend):
+    if backend == "onnx":
+        from app.retriever.onnx_embeddings import OnnxEmbeddings
+
+        return OnnxEmbeddings(
+            model_name=model_name,
+            quantize=os.getenv("EMBEDDING_QUANTIZE", "").lower() in ("1", "true", "yes"),
+            num_threads=int(os.getenv("EMBEDDING_THREADS", "0")) or None,
+        )
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        # Constructing the embeddings is what imports torch, so patch only now
+        if "streamlit" in sys.modules:
+            from app.utils.torch_patch import patch_torch_classes
+
+            patch_torch_classes()
+        return embeddings
+    if backend == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        return DeterministicFakeEmbedding(size=384)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def get_embeddings(model_name="BAAI/bge-small-en-v1.5", backend=None):
+    """Return the shared embedding model, loading weights on first use only."""
+    key = (backend or DEFAULT_BACKEND, model_name)
+    with _lock:
+        if key not in _embeddings:
+            _embeddings[key] = _load_embeddings(model_name, key[0])
+        return _embeddings[key]
+
+
+def get_vectorstore(persist_directory="chroma_db", model_name="BAAI/bge-small-en-v1.5", backend=None, repo=None):
+    """
+    Return the shared Chroma store for (model_name, persist_directory).
+
+    With `repo`, the store is that repo's own collection, so searches only
+    scan (and only return) the target repo's blocks.
+    """
+    collection_name = collection_name_for(repo)
+    key = (backend or DEFAULT_BACKEND, model_name, persist_directory, collection_name)
+    with _lock:
+        if key in _vectorstores:
+            return _vectorstores[key]
+
+    # chromadb is only imported by stages that actually touch the vector store
+    from langchain_chroma import Chroma
+
+    embedding_model = get_embeddings(model_name, backend=key[0])
+    with _lock:
+        if key not in _vectorstores:
+            _vectorstores[key] = Chroma(
+                collection_name=collection_name,
+                persist_directory=persist_directory,
+                embedding_function=embedding_model,
+            )
+        return _vectorstores[key]
+
+
+def shutdown_vectorstores():
+    """Drop every cached store, lexical index and embedding model so their memory can be reclaimed."""
+    from app.retriever import lexical_index
+
+    with _lock:
+        _vectorstores.clear()
+        _embeddings.clear()
+    with lexical_index._lock:
+        lexical_index._indexes.clear()
@@ -0,0 +1,92 @@
+import re
+
+from langchain.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from app.utils.concurrency import block_result, invoke_block
+from app.utils.context_packer import DEFAULT_MODEL, count_tokens
+from app.utils.telemetry import count, mark_error, span
+
+# Blocks at most this large are worth sharing a request with others
+SMALL_BLOCK_TOKENS = 300
+
+BATCH_HEADER = """
+        The code below contains {n} independent blocks, each wrapped in <block id="..."></block> tags.
+        Apply the instructions that follow to every block separately, and wrap the answer for
+        each block in <result id="..."></result> tags carrying the same id. Answer every block.
+"""
+
+RESULT_RE = re.compile(r'<result id="(\d+)">(.*?)</result>', re.DOTALL)
+
+
+def make_batch_chain(prompt, llm):
+    """Multi-block variant of an agent's `{code}` prompt, sharing the same LLM."""
+    return PromptTemplate.from_template(BATCH_HEADER + prompt.template) | llm | StrOutputParser()
+
+
+def group_blocks(blocks, budget=1500, small_block_tokens=SMALL_BLOCK_TOKENS, model=DEFAULT_MODEL):
+    """
+    Split blocks into consecutive groups of small blocks totalling at most
+    `budget` tokens. Blocks above `small_block_tokens` stay on their own.
+    """
+    groups, current, used = [], [], 0
+    for block in blocks:
+        tokens = count_tokens(block["code"] or "", model)
+        if tokens > small_block_tokens:
+            if current:
+                groups.append(current)
+                current, used = [], 0
+            groups.append([block])
+            continue
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(block)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def render_batch(blocks) -> str:
+    return "\n\n".join(f'<block id="{i}">\n{block["code"]}\n</block>' for i, block in enumerate(blocks, 1))
+
+
+def parse_batch(text: str, n: int) -> dict:
+    """Map 0-based block index to its answer; missing or empty answers are left out."""
+    parsed = {}
+    for match in RESULT_RE.finditer(text or ""):
+        index = int(match.group(1)) - 1
+        answer = match.group(2).strip()
+        if 0 <= index < n and answer:
+            parsed[index] = answer
+    return parsed
+
+
+def iter_batched(chain, batch_chain, blocks, budget=1500, model=DEFAULT_MODEL):
+    """
+    Yield one {block, output, error} result per block, in order, packing
+    small blocks into shared requests through `batch_chain`.
+
+    Blocks whose answer is missing from (or unparseable in) the batched
+    response are re-run on their own through `chain`.
+    """
+    for group in group_blocks(blocks, budget=budget, model=model):
+        if len(group) == 1:
+            yield invoke_block(chain, group[0], {"llm.retry": False})
+            continue
+
+        with span("agent.batch", {"blocks": len(group)}) as current:
+            try:
+                parsed = parse_batch(batch_chain.invoke({"code": render_batch(group), "n": len(group)}), len(group))
+            except Exception as e:
+                mark_error(e)
+                parsed = {}
+            current.set_attribute("blocks.parsed", len(parsed))
+
+        for i, block in enumerate(group):
+            if i in parsed:
+                yield block_result(block, output=parsed[i])
+            else:
+                count("llm.retries", attributes={"reason": "batch_unparsed"})
+                yield invoke_block(chain, block, {"llm.retry": True})
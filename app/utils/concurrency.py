@@ -0,0 +1,77 @@
+import asyncio
+
+from app.utils.telemetry import block_attributes, mark_error, span
+
+
+def block_result(block, output=None, error=None) -> dict:
+    """The {block, output, error} result every per-block path returns."""
+    return {
+        "block": block,
+        "output": output.strip() if isinstance(output, str) else output,
+        "error": str(error) if error is not None else None,
+    }
+
+
+def invoke_block(chain, block, attributes=None) -> dict:
+    """Run `chain` on one block inside an `agent.block` span; a failure becomes an `error` result."""
+    with span("agent.block", {**block_attributes(block), **(attributes or {})}):
+        try:
+            return block_result(block, output=chain.invoke({"code": block["code"]}))
+        except Exception as e:
+            mark_error(e)
+            return block_result(block, error=e)
+
+
+async def ainvoke_block(chain, block, attributes=None) -> dict:
+    """Async variant of `invoke_block`."""
+    with span("agent.block", {**block_attributes(block), **(attributes or {})}):
+        try:
+            return block_result(block, output=await chain.ainvoke({"code": block["code"]}))
+        except Exception as e:
+            mark_error(e)
+            return block_result(block, error=e)
+
+
+def batch_blocks(chain, blocks, max_concurrency=8):
+    """
+    Run `chain` over every block through one `chain.batch` call with at most
+    `max_concurrency` calls in flight. Results come back in input order; a
+    failing block yields an `error` entry instead of cancelling the others.
+    """
+    if not blocks:
+        return []
+    with span("agent.batch", {"blocks": len(blocks)}):
+        outputs = chain.batch(
+            [{"code": block["code"]} for block in blocks],
+            config={"max_concurrency": max(1, max_concurrency)},
+            return_exceptions=True,
+        )
+    return [
+        block_result(block, error=out) if isinstance(out, Exception) else block_result(block, output=out)
+        for block, out in zip(blocks, outputs)
+    ]
+
+
+async def astream_blocks(chain, blocks, max_concurrency=8, attributes=None):
+    """
+    Run `chain` over every block with at most `max_concurrency` calls in
+    flight and yield each result as soon as it completes.
+
+    Completion order is not input order, so every result carries the
+    block's input position as `index`.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run(index, block):
+        async with semaphore:
+            result = await ainvoke_block(chain, block, attributes)
+        result["index"] = index
+        return result
+
+    tasks = [asyncio.ensure_future(_run(i, block)) for i, block in enumerate(blocks)]
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        for task in tasks:
+            task.cancel()
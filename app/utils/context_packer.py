@@ -0,0 +1,130 @@
+import os
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Context windows (prompt + completion) of the chat models we target
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16_385,
+    "gpt-4": 8_192,
+    "gpt-4-turbo": 128_000,
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+}
+
+# Tokens kept free for the model's answer
+COMPLETION_RESERVE = 1_500
+
+# "\n\n" between packed blocks
+SEPARATOR = "\n\n"
+
+ENTRY_POINT_FILES = {"main.py", "__main__.py", "app.py", "cli.py", "manage.py", "setup.py",
+                     "streamlit_app.py", "dockerfile"}
+ENTRY_POINT_NAMES = {"main", "cli", "run", "app", "create_app"}
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=DEFAULT_MODEL):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model=DEFAULT_MODEL) -> int:
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def context_budget(model=DEFAULT_MODEL, prompt_template="", reserve=COMPLETION_RESERVE) -> int:
+    """Tokens left for `{code}` once the prompt template and the answer are accounted for."""
+    window = MODEL_CONTEXT_TOKENS.get(model, MODEL_CONTEXT_TOKENS[DEFAULT_MODEL])
+    return max(0, window - count_tokens(prompt_template, model) - reserve)
+
+
+def file_priority(filepath: str) -> tuple:
+    """Lower sorts first: READMEs, then entry points, then shallow paths."""
+    name = os.path.basename(filepath).lower()
+    depth = filepath.count(os.sep)
+    if name.startswith("readme"):
+        tier = 0
+    elif name in ENTRY_POINT_FILES:
+        tier = 1
+    elif name.endswith(".py") or name.endswith(".ipynb"):
+        tier = 2
+    else:
+        tier = 3
+    return tier, depth, filepath
+
+
+def block_priority(block: dict) -> int:
+    """Lower is more important: docs, entry points, public top-level symbols, then the rest."""
+    name = block.get("name") or ""
+    if block.get("type") == "markdown":
+        return 0
+    if name.lower() in ENTRY_POINT_NAMES or os.path.basename(block.get("file", "")).lower() in ENTRY_POINT_FILES:
+        return 1
+    if block.get("parent") is None and not name.startswith("_"):
+        return 2
+    if not name.startswith("_"):
+        return 3
+    return 4
+
+
+def iter_ranked_blocks(files, load_blocks, primary_tier=2, window=8):
+    """
+    Lazily yield blocks, most important first.
+
+    Files are visited in `file_priority` order and only read (through
+    `load_blocks(filepath)`) when the consumer asks for more. Blocks up to
+    `primary_tier` are yielded straight away; lower tiers are held back
+    for at most `window` files, then yielded before the next file is read,
+    so a consumer that stops early never forces the whole repo to be read.
+    """
+    deferred = []
+    for visited, filepath in enumerate(sorted(files, key=file_priority), 1):
+        for block in sorted(load_blocks(filepath), key=block_priority):
+            if block_priority(block) <= primary_tier:
+                yield block
+            else:
+                deferred.append(block)
+        if visited % window == 0 and deferred:
+            deferred.sort(key=block_priority)
+            yield from deferred
+            deferred = []
+    deferred.sort(key=block_priority)
+    yield from deferred
+
+
+def pack_blocks(blocks, budget: int, model=DEFAULT_MODEL, min_fill=32, target_fill=0.9, max_misses=8):
+    """
+    Greedily take blocks (in the given order) while they fit in `budget` tokens.
+
+    Blocks too large for the remaining space are skipped in favour of later,
+    smaller ones. Consumption stops once the budget is `target_fill` full,
+    fewer than `min_fill` tokens remain, or `max_misses` blocks in a row
+    didn't fit, so a lazy `blocks` iterator is not drained (read and
+    tokenized) further than needed. Returns (selected_blocks, tokens_used).
+    """
+    sep_tokens = count_tokens(SEPARATOR, model)
+    selected, used, misses = [], 0, 0
+
+    for block in blocks:
+        code = block.get("code")
+        if not code or not code.strip():
+            continue
+        cost = count_tokens(code, model) + (sep_tokens if selected else 0)
+        if used + cost <= budget:
+            selected.append(block)
+            used += cost
+            misses = 0
+        else:
+            misses += 1
+        if budget - used < min_fill or used >= budget * target_fill or misses >= max_misses:
+            break
+    return selected, used
+
+
+def join_blocks(blocks) -> str:
+    return SEPARATOR.join(block["code"] for block in blocks)
@@ -0,0 +1,158 @@
+import os
+import re
+
+from app.utils.telemetry import count, span
+
+# Minimum estimated Jaccard similarity (over token shingles) for two blocks to share one LLM answer
+DEFAULT_DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 similarity become candidates
+
+_COMMENT_RE = re.compile(r"#[^\n]*")
+_TOKEN_RE = re.compile(r"[A-Za-z_]\w*|\d+(?:\.\d+)?|\S")
+
+
+def normalized_tokens(code) -> list:
+    """Code tokens without comments or whitespace, so reformatting doesn't matter."""
+    return _TOKEN_RE.findall(_COMMENT_RE.sub("", code or ""))
+
+
+def shingles(tokens, size=SHINGLE_SIZE) -> set:
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash(items, num_perm=NUM_PERM) -> tuple:
+    """MinHash signature of a set of strings: the minimum of `num_perm` seeded murmur3 hashes."""
+    import mmh3
+
+    if not items:
+        return (0,) * num_perm
+    return tuple(min(mmh3.hash(item, seed, signed=False) for item in items) for seed in range(num_perm))
+
+
+def similarity(a, b) -> float:
+    """Estimated Jaccard similarity of the sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class DuplicateIndex:
+    """
+    Groups near-identical blocks (copy-pasted helpers, vendored modules,
+    repeated notebook cells) so each group is sent to the LLM once.
+
+    Blocks are visited in order; each one either joins the first earlier
+    representative whose MinHash signature is at least `threshold`
+    similar (candidates come from LSH buckets, exact copies match
+    directly) or becomes a representative itself. Every duplicate is
+    therefore close to its representative, not just to some other member.
+    """
+
+    def __init__(self, blocks, threshold=DEFAULT_DEDUP_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        self.threshold = threshold
+        self._blocks = list(blocks)   # keeps ids below stable
+        self._representative = {}     # id(duplicate) -> representative block
+        self._duplicates = {}         # id(representative) -> [duplicate blocks]
+        self._pending = {}            # id(duplicate) -> its copy of the representative's result
+
+        rows = num_perm // bands
+        exact = {}
+        buckets = {}
+        signatures = {}
+        with span("dedup", {"dedup.blocks": len(self._blocks), "dedup.threshold": threshold}) as current:
+            for block in self._blocks:
+                tokens = normalized_tokens(block.get("code"))
+                key = " ".join(tokens)
+                if key in exact:
+                    self._link(block, exact[key])
+                    continue
+
+                signature = minhash(shingles(tokens), num_perm)
+                bands_of = [(band, signature[band * rows:(band + 1) * rows]) for band in range(bands)]
+                match = None
+                for band_key in bands_of:
+                    for candidate in buckets.get(band_key, ()):
+                        if similarity(signature, signatures[id(candidate)]) >= threshold:
+                            match = candidate
+                            break
+                    if match is not None:
+                        break
+
+                if match is not None:
+                    self._link(block, match)
+                    continue
+                exact[key] = block
+                signatures[id(block)] = signature
+                for band_key in bands_of:
+                    buckets.setdefault(band_key, []).append(block)
+
+            current.set_attribute("dedup.duplicates", len(self._representative))
+        if self._representative:
+            count("blocks.deduplicated", len(self._representative))
+            print(f"🔁 {len(self._representative)} near-duplicate blocks will reuse the answer of "
+                  f"{len(self._duplicates)} representatives")
+
+    def _link(self, block, representative):
+        self._representative[id(block)] = representative
+        self._duplicates.setdefault(id(representative), []).append(block)
+
+    def representative_of(self, block):
+        """The block whose answer `block` reuses, or None if it is a representative."""
+        return self._representative.get(id(block))
+
+    def duplicates_of(self, block) -> list:
+        return self._duplicates.get(id(block), [])
+
+    def fan_out(self, block, result):
+        """
+        (`result` tagged with its duplicates' locations, [one copy per
+        duplicate pointing back at `block`]) for a representative's result.
+        """
+        duplicates = self.duplicates_of(block)
+        if not duplicates:
+            return result, []
+        copies = [{"block": duplicate, "output": result["output"], "error": result["error"],
+                   "duplicate_of": _location(block)} for duplicate in duplicates]
+        return {**result, "duplicates": [_location(b) for b in duplicates]}, copies
+
+
+def _location(block) -> dict:
+    return {"name": block.get("name"), "file": block.get("file"), "lineno": block.get("lineno")}
+
+
+def iter_deduped(index, blocks, run):
+    """
+    Yield one result per block, in order: representatives' results come from
+    `run(representatives)` (one per block, in order) and are tagged with
+    their duplicates' locations; each duplicate gets a copy of its
+    representative's result tagged with `duplicate_of`. A duplicate's
+    representative always comes earlier, in this call or a previous one.
+    """
+    if index is None:
+        yield from run(blocks)
+        return
+
+    results = run([block for block in blocks if index.representative_of(block) is None])
+    for block in blocks:
+        representative = index.representative_of(block)
+        if representative is None:
+            result, copies = index.fan_out(block, next(results))
+            for copy in copies:
+                index._pending[id(copy["block"])] = copy
+            yield result
+        else:
+            yield index._pending.pop(id(block))
+
+
+def cross_references(result) -> str:
+    """Extra lines for format_result pointing duplicates and their representative at each other."""
+    if result.get("duplicate_of"):
+        ref = result["duplicate_of"]
+        return f"\n↪️ Near-duplicate of `{ref['name']}` ({ref['file']}:{ref['lineno']}); answer reused"
+    if result.get("duplicates"):
+        refs = ", ".join(f"`{d['name']}` ({d['file']}:{d['lineno']})" for d in result["duplicates"])
+        return f"\n🔁 Also applies to near-duplicates: {refs}"
+    return ""
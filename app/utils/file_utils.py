@@ -1,14 +1,201 @@
-from pathlib import Path
+import json
+import os
+import re
 
-def collect_supported_files(code_dir: str) -> list:
-    """Collect all supported source files from the code directory."""
-    file_types = [".py", ".ipynb", ".md", ".yaml", ".yml"]
-    all_files = []
+from app.utils.telemetry import count, span
 
-    for ext in file_types:
-        all_files.extend(Path(code_dir).rglob(f"*{ext}"))
+SUPPORTED_EXTENSIONS = (".py", ".ipynb", ".md", ".yaml", ".yml")
+SUPPORTED_FILENAMES = ("Dockerfile",)
 
-    # Explicitly include Dockerfile
-    all_files.extend(Path(code_dir).rglob("Dockerfile"))
+# Directory names never worth descending into, at any depth
+DEFAULT_EXCLUDES = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".ipynb_checkpoints",
+    ".venv", "venv", "site-packages", ".tox", ".nox", ".mypy_cache",
+    ".pytest_cache", ".ruff_cache",
+})
 
-    return [str(f) for f in all_files]
+# Directory names skipped only at the repo root: deeper down they are often real packages (e.g. `pkg/build/`)
+ROOT_EXCLUDES = frozenset({"env", "vendor", "third_party", "dist", "build"})
+
+# Files above this size are generated/vendored far more often than hand-written;
+# notebooks are measured by their cells' source, without outputs
+MAX_FILE_SIZE = 1_000_000
+
+
+def _kind_rank(filepath: str) -> int:
+    """Discovery order: source files first, then notebooks, docs and config."""
+    name = os.path.basename(filepath)
+    for rank, ext in enumerate(SUPPORTED_EXTENSIONS):
+        if name.endswith(ext):
+            return rank
+    return len(SUPPORTED_EXTENSIONS)
+
+
+def _translate_glob(pattern: str) -> str:
+    """Translate a gitignore glob into a regex fragment (`*` never crosses `/`)."""
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def _parse_gitignore(path: str, base: str) -> list:
+    """Read one .gitignore into (base, regex, negate, dir_only) rules."""
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        anchored = "/" in line
+        line = line.lstrip("/")
+        prefix = "" if anchored else "(?:.*/)?"
+        rules.append((base, re.compile(f"^{prefix}{_translate_glob(line)}$"), negate, dir_only))
+    return rules
+
+
+def _is_ignored(rules: list, relpath: str, is_dir: bool) -> bool:
+    ignored = False
+    for base, regex, negate, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not relpath.startswith(base + "/"):
+                continue
+            candidate = relpath[len(base) + 1:]
+        else:
+            candidate = relpath
+        if regex.match(candidate):
+            ignored = not negate
+    return ignored
+
+
+def _notebook_source_size(path: str) -> int:
+    """Bytes of cell source in a notebook, i.e. its size once outputs are stripped."""
+    with open(path, "r", encoding="utf-8") as f:
+        cells = json.load(f).get("cells", [])
+    return sum(len("".join(cell.get("source", ""))) for cell in cells)
+
+
+def _too_large(entry, max_file_size) -> bool:
+    try:
+        size = entry.stat().st_size
+        if size > max_file_size and entry.name.endswith(".ipynb"):
+            size = _notebook_source_size(entry.path)
+    except (OSError, ValueError, AttributeError):
+        return True
+    if size > max_file_size:
+        print(f"⚠️ Skipping {entry.path}: {size} bytes is over the {max_file_size} byte limit")
+        count("files.skipped", attributes={"reason": "too_large"})
+        return True
+    return False
+
+
+def iter_supported_files(code_dir: str, exclude=DEFAULT_EXCLUDES, max_file_size=MAX_FILE_SIZE,
+                         use_gitignore=True, root_exclude=ROOT_EXCLUDES):
+    """
+    Yield supported source files under `code_dir` in one `os.scandir` traversal.
+
+    Skips directories named in `exclude` (at any depth) or `root_exclude`
+    (top level only), paths matched by `.gitignore` files (root and
+    nested), and files larger than `max_file_size` bytes (None disables
+    the cap; notebooks count without their outputs), logging each one.
+    Entries are visited in sorted order so the output is deterministic.
+    """
+    root = str(code_dir).rstrip(os.sep) or os.sep
+    stack = [(root, "", [])]
+
+    while stack:
+        dirpath, reldir, rules = stack.pop()
+        if use_gitignore:
+            gitignore = os.path.join(dirpath, ".gitignore")
+            if os.path.isfile(gitignore):
+                rules = rules + _parse_gitignore(gitignore, reldir)
+
+        try:
+            with os.scandir(dirpath) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            relpath = f"{reldir}/{entry.name}" if reldir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+
+            if is_dir:
+                if entry.name in exclude or (not reldir and entry.name in root_exclude) \
+                        or (rules and _is_ignored(rules, relpath, True)):
+                    continue
+                subdirs.append((entry.path, relpath, rules))
+                continue
+
+            if not (entry.name.endswith(SUPPORTED_EXTENSIONS) or entry.name in SUPPORTED_FILENAMES):
+                continue
+            if rules and _is_ignored(rules, relpath, False):
+                continue
+            if max_file_size is not None and _too_large(entry, max_file_size):
+                continue
+            yield entry.path
+
+        # Reverse so the stack pops subdirectories in sorted order
+        stack.extend(reversed(subdirs))
+
+
+def collect_supported_files(code_dir: str, **kwargs) -> list:
+    """
+    Collect all supported source files from the code directory.
+
+    Files are grouped by kind in SUPPORTED_EXTENSIONS order (.py first,
+    Dockerfiles last), walk order within a group, so agents limited to
+    the first few files spend them on code rather than docs or config.
+    """
+    with span("discovery", {"repo.path": code_dir}) as current:
+        files = sorted(iter_supported_files(code_dir, **kwargs), key=_kind_rank)
+        current.set_attribute("files", len(files))
+    count("files.discovered", len(files))
+    return files
@@ -0,0 +1,155 @@
+import os
+import re
+import subprocess
+
+HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+# Where the diff base is fetched to; clone refreshes fetch into FETCH_HEAD and never update origin/*
+BASE_REF = "refs/codebase-companion/base"
+# Extra commits fetched into a shallow clone, step by step, until the base resolves and has a merge-base
+DEEPEN_STEPS = (50, 200, 1000)
+
+
+def _git(repo_path, *args) -> str:
+    return subprocess.run(["git", *args], cwd=repo_path, check=True, capture_output=True, text=True).stdout
+
+
+def head_commit(repo_path: str):
+    """SHA of the checkout's HEAD, or None outside a git repo."""
+    try:
+        return _git(repo_path, "rev-parse", "HEAD").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _deepen(repo_path: str, depth: int, refspecs=()) -> bool:
+    """Fetch `depth` more commits into a shallow clone; False if it isn't shallow or can't be deepened."""
+    try:
+        if _git(repo_path, "rev-parse", "--is-shallow-repository").strip() != "true":
+            return False
+        _git(repo_path, "fetch", "--quiet", "--filter=blob:none", f"--deepen={depth}", "origin", *refspecs)
+    except subprocess.CalledProcessError:
+        return False
+    return True
+
+
+def _resolve_base(repo_path: str, base_ref: str):
+    """
+    (commit, refspecs to deepen it with) for `base_ref`.
+
+    Refs origin knows ("main", "origin/main", tags, SHAs) are always
+    fetched fresh into BASE_REF, so a refreshed clone never diffs against
+    the first clone's view of the remote. Anything else (HEAD~1, local
+    branches, repos without origin) resolves locally, deepening a shallow
+    clone until it does. Raises ValueError if `base_ref` can't be found.
+    """
+    refspecs = (f"+{base_ref.removeprefix('origin/')}:{BASE_REF}",)
+    try:
+        _git(repo_path, "fetch", "--quiet", "--filter=blob:none", f"--depth={DEEPEN_STEPS[0]}", "origin", *refspecs)
+        return _git(repo_path, "rev-parse", BASE_REF).strip(), refspecs
+    except subprocess.CalledProcessError:
+        pass
+
+    for depth in (None,) + DEEPEN_STEPS:
+        if depth is not None and not _deepen(repo_path, depth):
+            break
+        try:
+            return _git(repo_path, "rev-parse", "--verify", "--quiet", f"{base_ref}^{{commit}}").strip(), ()
+        except subprocess.CalledProcessError:
+            continue
+    raise ValueError(f"❌ Can't resolve base ref '{base_ref}' in {repo_path}: "
+                     f"origin has no such ref and it isn't a commit in the local history")
+
+
+def changed_hunks(repo_path: str, base_ref: str) -> dict:
+    """
+    Map each file changed since `base_ref` to its changed line ranges.
+
+    Diffs the merge-base of `base_ref` and HEAD against the working tree,
+    deepening a shallow clone until the merge-base exists (falling back to
+    `base_ref` itself if it never does). Ranges are inclusive (start, end)
+    lines on the new side; pure deletions become a one-line range at the
+    deletion point. Deleted files are skipped. Keys are paths relative to
+    `repo_path`. Raises ValueError if `base_ref` can't be resolved.
+    """
+    base, refspecs = _resolve_base(repo_path, base_ref)
+    merge_base = None
+    for depth in (None,) + DEEPEN_STEPS:
+        if depth is not None and not _deepen(repo_path, depth, refspecs):
+            break
+        try:
+            merge_base = _git(repo_path, "merge-base", base, "HEAD").strip()
+            break
+        except subprocess.CalledProcessError:
+            pass
+    if merge_base is None:
+        print(f"⚠️ No common history with {base_ref} found; diffing against it directly")
+    base = merge_base or base
+
+    diff = _git(repo_path, "diff", "--unified=0", "--no-color", "--no-ext-diff",
+                "--diff-filter=AMR", "--relative", base)
+
+    hunks, current = {}, None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            path = line[4:]
+            current = path[2:] if path.startswith("b/") else None
+            if current is not None:
+                hunks.setdefault(current, [])
+        elif current is not None:
+            match = HUNK_RE.match(line)
+            if match:
+                start, count = int(match.group(1)), int(match.group(2) or 1)
+                if count == 0:
+                    hunks[current].append((max(start, 1), max(start, 1)))
+                else:
+                    hunks[current].append((start, start + count - 1))
+    return hunks
+
+
+def blocks_touched(blocks: list, ranges: list) -> list:
+    """
+    Blocks of one file that a set of changed line ranges falls into.
+
+    Each changed line is credited to the innermost Python block containing
+    it, so editing one method selects that method rather than its whole
+    class. Blocks without line spans (notebook cells, markdown, YAML) are
+    selected whenever their file changed.
+    """
+    spanned = [b for b in blocks if b.get("end_lineno")]
+    touched = {id(b) for b in blocks if not b.get("end_lineno")} if ranges else set()
+
+    for start, end in ranges:
+        for line in range(start, end + 1):
+            containing = [b for b in spanned if b["lineno"] <= line <= b["end_lineno"]]
+            if containing:
+                innermost = min(containing, key=lambda b: b["end_lineno"] - b["lineno"])
+                touched.add(id(innermost))
+
+    return [b for b in blocks if id(b) in touched]
+
+
+def iter_target_blocks(repo_path: str, files: list, load_blocks, max_files=None, base_ref=None, hunks=None):
+    """
+    Yield (file, blocks) pairs for an agent to process.
+
+    Without `base_ref` this is simply the first `max_files` files with all
+    of their blocks. With `base_ref`, every file changed since that ref is
+    visited and only the blocks touched by the diff are yielded; `hunks`
+    (from changed_hunks) skips re-reading the diff.
+    """
+    if base_ref is None:
+        for f in files[:max_files]:
+            yield f, load_blocks(f)
+        return
+
+    if hunks is None:
+        hunks = changed_hunks(repo_path, base_ref)
+    print(f"🔀 {len(hunks)} files changed since {base_ref}")
+    for f in files:
+        ranges = hunks.get(os.path.relpath(f, repo_path))
+        if not ranges:
+            continue
+        blocks = blocks_touched(load_blocks(f), ranges)
+        if blocks:
+            yield f, blocks
@@ -2,27 +2,96 @@ import os
 import subprocess
 from urllib.parse import urlparse
 
-def download_github_repo(repo_url: str, target_dir="data/repos") -> str:
-    """Clones a GitHub repo and returns the local path."""
-
-    # Parse URL and extract user/repo name
-    try:
-        parsed_url = urlparse(repo_url)
-        parts = parsed_url.path.strip("/").split("/")
-        if len(parts) != 2:
-            raise ValueError("❌ Invalid GitHub URL. Use format: https://github.com/owner/repo")
-        user_name, repo_name = parts
-    except Exception as e:
-        raise ValueError(f"❌ Failed to parse repo URL: {e}")
-
-    local_path = os.path.join(target_dir, f"{user_name}_{repo_name}")
-
-    # If already cloned
-    if os.path.exists(local_path):
-        print(f"📦 Repo already exists locally at: {local_path}")
-        return local_path
+from app.utils.file_utils import SUPPORTED_EXTENSIONS, SUPPORTED_FILENAMES
+from app.utils.telemetry import annotate, span
+
+# Non-cone sparse-checkout patterns: only files the parsers understand are materialised
+SPARSE_PATTERNS = [f"*{ext}" for ext in SUPPORTED_EXTENSIONS] + list(SUPPORTED_FILENAMES)
+
+
+def _git(*args, cwd=None):
+    subprocess.run(["git", *args], cwd=cwd, check=True)
+
+
+def _local_name(repo_url: str) -> str:
+    """Folder name for a clone: owner_repo for GitHub URLs, parent_repo for file:// URLs."""
+    parsed_url = urlparse(repo_url)
+    parts = parsed_url.path.strip("/").split("/")
+
+    if parsed_url.scheme == "file":
+        parts = [p for p in parts if p][-2:]
+    elif len(parts) != 2:
+        raise ValueError("❌ Invalid GitHub URL. Use format: https://github.com/owner/repo")
+
+    parts[-1] = parts[-1].removesuffix(".git")
+    return "_".join(parts)
+
+
+def local_repo_path(repo_url: str, target_dir="data/repos") -> str:
+    """Where download_github_repo puts (or finds) `repo_url`: local directories are used in place."""
+    if "://" not in repo_url and os.path.isdir(repo_url):
+        return repo_url
+    return os.path.join(target_dir, _local_name(repo_url))
+
 
-    # Run git clone
-    print(f"⬇️ Cloning repo to: {local_path}")
-    subprocess.run(["git", "clone", repo_url, local_path], check=True)
-    return local_path
+def _sync(local_path: str, ref=None, depth=1):
+    """Fetch `ref` (default: the remote's HEAD) and hard-reset the checkout onto it."""
+    fetch = ["fetch", "--filter=blob:none"]
+    if depth:
+        fetch.append(f"--depth={depth}")
+    _git(*fetch, "origin", ref or "HEAD", cwd=local_path)
+    _git("reset", "--hard", "--quiet", "FETCH_HEAD", cwd=local_path)
+
+
+def download_github_repo(repo_url: str, target_dir="data/repos", ref=None, depth=1, sparse=True,
+                         refresh=True) -> str:
+    """
+    Clones a GitHub repo and returns the local path.
+
+    By default the clone is shallow (`depth`), blob-less and sparse, so only
+    supported file types are downloaded. An existing clone is refreshed
+    with a cheap fetch + reset onto `ref` (branch, tag or commit; default:
+    the remote HEAD) unless refresh=False. Local directories are returned
+    as-is, and file:// URLs are cloned like remote ones.
+    """
+    with span("clone", {"repo.url": repo_url, "git.ref": ref or "HEAD", "git.depth": depth, "git.sparse": sparse}):
+        if "://" not in repo_url and os.path.isdir(repo_url):
+            print(f"📂 Using local repo at: {repo_url}")
+            annotate({"clone.mode": "local"})
+            return repo_url
+
+        # Parse URL and extract user/repo name
+        try:
+            local_name = _local_name(repo_url)
+        except Exception as e:
+            raise ValueError(f"❌ Failed to parse repo URL: {e}")
+
+        local_path = os.path.join(target_dir, local_name)
+
+        # If already cloned
+        if os.path.exists(local_path):
+            if not refresh or not os.path.isdir(os.path.join(local_path, ".git")):
+                print(f"📦 Repo already exists locally at: {local_path}")
+                annotate({"clone.mode": "existing"})
+                return local_path
+            print(f"🔄 Refreshing existing clone at: {local_path}")
+            annotate({"clone.mode": "refresh"})
+            _sync(local_path, ref=ref, depth=depth)
+            return local_path
+
+        # Clone without checkout so sparse patterns apply before any blob is fetched
+        print(f"⬇️ Cloning repo to: {local_path}")
+        annotate({"clone.mode": "clone"})
+        clone = ["clone", "--no-checkout", "--filter=blob:none"]
+        if depth:
+            clone.append(f"--depth={depth}")
+        _git(*clone, repo_url, local_path)
+
+        if sparse:
+            _git("sparse-checkout", "set", "--no-cone", *SPARSE_PATTERNS, cwd=local_path)
+
+        if ref:
+            _sync(local_path, ref=ref, depth=depth)
+        else:
+            _git("reset", "--hard", "--quiet", "HEAD", cwd=local_path)
+        return local_path
@@ -0,0 +1,132 @@
+from functools import lru_cache
+
+from app.utils.rate_limit import RateLimiter
+from app.utils.telemetry import count, record, span
+
+# Process-wide limiter shared by every agent and stage: adaptive in-flight
+# cap (at most 8), LLM_RPM / LLM_TPM rate limits and retries
+_limiter = RateLimiter(max_concurrency=8)
+
+# Optional replacement for the chat model built by get_llm (see set_llm_factory)
+_llm_factory = None
+
+
+def set_llm_concurrency(limit: int):
+    """Resize the global in-flight budget (calls already running keep their slot)."""
+    _limiter.concurrency.resize(limit)
+
+
+def set_rate_limits(rpm=None, tpm=None, max_retries=None, max_concurrency=None):
+    """
+    Replace the global limiter, e.g. with the provider's requests/tokens per
+    minute (0 = unlimited). Unset arguments keep their env/default values.
+    """
+    global _limiter
+    current = _limiter
+    kwargs = {"max_concurrency": max_concurrency or current.concurrency.maximum}
+    if rpm is not None:
+        kwargs["rpm"] = rpm
+    if tpm is not None:
+        kwargs["tpm"] = tpm
+    if max_retries is not None:
+        kwargs["max_retries"] = max_retries
+    _limiter = RateLimiter(**kwargs)
+    return _limiter
+
+
+def set_llm_factory(factory=None):
+    """
+    Make get_llm return `factory(model=..., temperature=...)` instead of a
+    ChatOpenAI, e.g. a fake model for offline benchmarks. None restores it.
+    """
+    global _llm_factory
+    _llm_factory = factory
+
+
+def _estimate_tokens(messages, llm) -> int:
+    """Rough size of a request for the tokens-per-minute bucket: ~4 chars per prompt token plus the reply allowance."""
+    chars = sum(len(str(getattr(m, "content", m))) for m in messages or ())
+    return chars // 4 + (getattr(llm, "max_tokens", None) or 512)
+
+
+def _used_tokens(result) -> int:
+    usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    return usage.get("total_tokens") or 0
+
+
+def _record_usage(current, model, result, waited):
+    """Put queue wait and token usage of one LLM call on its span and metrics."""
+    record("llm.queue_wait", waited, {"llm.model": model})
+    usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    attributes = {"llm.queue_wait_s": round(waited, 4)}
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            attributes[f"llm.{kind}_tokens"] = tokens
+            count("llm.tokens", tokens, {"llm.model": model, "kind": kind})
+    current.set_attributes(attributes)
+
+
+class BudgetedLLMMixin:
+    """
+    Chat model mixin whose generate calls go through the global rate
+    limiter (in-flight budget, rate limits, retries on throttling and
+    transient errors); cache hits don't. Every call is traced as an
+    `llm.call` span.
+    """
+
+    def _generate(self, messages, *args, **kwargs):
+        limiter = _limiter
+        model = getattr(self, "model_name", None)
+        generate = super()._generate
+        with span("llm.call", {"llm.model": model}) as current:
+            status = "error"
+            try:
+                result, waited, attempts = limiter.call(lambda: generate(messages, *args, **kwargs),
+                                                        _estimate_tokens(messages, self), model, _used_tokens)
+                status = "ok"
+                current.set_attribute("llm.attempts", attempts)
+                _record_usage(current, model, result, waited)
+                return result
+            finally:
+                count("llm.calls", attributes={"llm.model": model, "status": status})
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        limiter = _limiter
+        model = getattr(self, "model_name", None)
+        agenerate = super()._agenerate
+        with span("llm.call", {"llm.model": model}) as current:
+            status = "error"
+            try:
+                result, waited, attempts = await limiter.acall(lambda: agenerate(messages, *args, **kwargs),
+                                                               _estimate_tokens(messages, self), model, _used_tokens)
+                status = "ok"
+                current.set_attribute("llm.attempts", attempts)
+                _record_usage(current, model, result, waited)
+                return result
+            finally:
+                count("llm.calls", attributes={"llm.model": model, "status": status})
+
+
+@lru_cache(maxsize=None)
+def chat_model_class():
+    """BudgetedChatOpenAI, defined on first use so importing this module doesn't load the OpenAI SDK."""
+    from langchain_openai import ChatOpenAI
+
+    class BudgetedChatOpenAI(BudgetedLLMMixin, ChatOpenAI):
+        """ChatOpenAI sharing the global rate limiter."""
+
+    return BudgetedChatOpenAI
+
+
+def get_llm(model="gpt-3.5-turbo", temperature=0.2, use_cache=True):
+    """Build the chat model used by every agent, wired to the shared response cache."""
+    if _llm_factory is not None:
+        return _llm_factory(model=model, temperature=temperature)
+    from app.utils.llm_cache import get_llm_cache
+
+    cache = get_llm_cache() if use_cache else None
+    # cache=False (rather than None) keeps LangChain from falling back to a global cache.
+    # Retries are left to the shared limiter, which also adapts concurrency to throttling.
+    return chat_model_class()(model=model, temperature=temperature, cache=cache if cache is not None else False,
+                              max_retries=0)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from app.utils.telemetry import annotate, count
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Disk-backed LangChain cache for LLM responses.
+
+    Entries are keyed by a hash of the rendered prompt plus LangChain's
+    `llm_string`, which already encodes model name, temperature and the
+    other call parameters. Old entries expire after `max_age` seconds and
+    the least recently used ones are dropped past `max_entries`.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=50_000, max_age=30 * 24 * 3600, enabled=True):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        if not self.enabled:
+            return None
+
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                count("llm.cache", attributes={"result": "miss"})
+                annotate({"llm.cache_hit": False})
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        count("llm.cache", attributes={"result": "hit"})
+        annotate({"llm.cache_hit": True})
+
+        return [loads(item) for item in json.loads(row[0])]
+
+    def update(self, prompt, llm_string, return_val):
+        if not self.enabled:
+            return
+
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), value, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.max_age:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.max_age,))
+        if self.max_entries:
+            self._conn.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": size, "enabled": self.enabled}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide response cache, or None when bypassed via LLM_CACHE_DISABLED=1."""
+    global _cache
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLLMCache()
+        return _cache
@@ -1,9 +1,70 @@
 import os
 import ast
-import nbformat
 
-def parse_python_file(filepath):
-    """Parse .py files using AST to extract function and class blocks."""
+BLOCK_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+class SourceIndex:
+    """Line-offset index over a source file, so any AST node can be sliced in O(1)."""
+
+    def __init__(self, source: str):
+        # AST column offsets are UTF-8 byte offsets, so index the encoded source
+        self.data = source.encode("utf-8")
+        self.line_starts = [0]
+        for line in self.data.splitlines(keepends=True):
+            self.line_starts.append(self.line_starts[-1] + len(line))
+
+    def offset(self, lineno, col):
+        return self.line_starts[lineno - 1] + col
+
+    def span(self, node):
+        return (self.offset(node.lineno, node.col_offset),
+                self.offset(node.end_lineno, node.end_col_offset))
+
+    def text(self, start, end):
+        return self.data[start:end].decode("utf-8", errors="replace")
+
+
+def _collect_defs(node, parent, found):
+    """Depth-first, source-ordered (node, qualname, parent_qualname, children) records."""
+    children = []
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, BLOCK_NODES):
+            qualname = f"{parent}.{child.name}" if parent else child.name
+            record = (child, qualname, parent, [])
+            found.append(record)
+            children.append(record)
+            record[3].extend(_collect_defs(child, qualname, found))
+        else:
+            children.extend(_collect_defs(child, parent, found))
+    return children
+
+
+def _skeleton(index, node, children):
+    """Source of `node` with every child block replaced by its header and `...`."""
+    start, end = index.span(node)
+    parts, cursor = [], start
+    for child, _, _, _ in children:
+        child_start, child_end = index.span(child)
+        body_start = index.offset(child.body[0].lineno, child.body[0].col_offset)
+        header = index.text(child_start, body_start).rstrip()
+        parts.append(index.text(cursor, child_start))
+        parts.append(f"{header}\n{' ' * (child.col_offset + 4)}...")
+        cursor = child_end
+    parts.append(index.text(cursor, end))
+    return "".join(parts)
+
+
+def parse_python_file(filepath, mode="nested"):
+    """
+    Parse .py files using AST to extract function and class blocks.
+
+    mode="nested" returns every block with its full source, so a class
+    also contains its methods. mode="flat" emits each line of code once:
+    blocks with nested defs become skeletons whose children are reduced
+    to their header plus `...`, and the children are emitted separately.
+    Every block records its `qualname` and enclosing `parent`.
+    """
     with open(filepath, "r", encoding="utf-8") as f:
         source = f.read()
     try:
@@ -11,23 +72,34 @@ def parse_python_file(filepath):
     except SyntaxError:
         return []
 
+    index = SourceIndex(source)
+    found = []
+    _collect_defs(tree, None, found)
+
     blocks = []
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-            code = ast.get_source_segment(source, node)
-            blocks.append({
-                "name": node.name,
-                "type": type(node).__name__,
-                "lineno": node.lineno,
-                "code": code,
-                "source": "python",
-                "file": filepath
-            })
+    for node, qualname, parent, children in found:
+        if mode == "flat" and children:
+            code = _skeleton(index, node, children)
+        else:
+            code = index.text(*index.span(node))
+        blocks.append({
+            "name": node.name,
+            "type": type(node).__name__,
+            "lineno": node.lineno,
+            "end_lineno": node.end_lineno,
+            "qualname": qualname,
+            "parent": parent,
+            "code": code,
+            "source": "python",
+            "file": filepath
+        })
     return blocks
 
 
 def parse_notebook_file(filepath):
     """Parse Jupyter notebooks and extract code cells."""
+    import nbformat  # pulls in jsonschema; only paid for by repos with notebooks
+
     with open(filepath, "r", encoding="utf-8") as f:
         nb = nbformat.read(f, as_version=4)
 
@@ -59,13 +131,13 @@ def parse_text_file(filepath, label="text"):
     }]
 
 
-def parse_file_by_type(filepath):
+def parse_file_by_type(filepath, mode="nested"):
     """Auto-detect file type and route to the appropriate parser."""
     ext = os.path.splitext(filepath)[-1].lower()
     filename = os.path.basename(filepath).lower()
 
     if ext == ".py":
-        return parse_python_file(filepath)
+        return parse_python_file(filepath, mode=mode)
     elif ext == ".ipynb":
         return parse_notebook_file(filepath)
     elif ext in [".yml", ".yaml"]:
@@ -78,6 +150,61 @@ def parse_file_by_type(filepath):
         return []
 
 
+# Below this many files a process pool costs more than it saves
+PARALLEL_MIN_FILES = 64
+
+
+def _parse_chunk(filepaths, mode):
+    """Worker entry point: parse a chunk of files, returning blocks or the raised exception per file."""
+    results = []
+    for filepath in filepaths:
+        try:
+            results.append(parse_file_by_type(filepath, mode=mode))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def parse_many(filepaths, mode="nested", workers=None, chunk_size=None, skip_errors=False):
+    """
+    Parse `filepaths` and return one block list per file, in input order.
+
+    Runs on a process pool of `workers` (default: CPU count) when there are
+    at least PARALLEL_MIN_FILES files, and serially otherwise or when
+    workers=1. Files are sent in chunks to amortise IPC. Results are
+    identical to calling parse_file_by_type on each file. A failing file
+    re-raises its error, or yields [] with skip_errors=True.
+
+    Workers start from a fork server (spawn where there is none), never a
+    plain fork: callers are multithreaded (scheduler, batch and job
+    threads), and a child forked while another thread holds a lock
+    (logging, SQLite, telemetry exporters) can deadlock.
+    """
+    filepaths = list(filepaths)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(filepaths) < PARALLEL_MIN_FILES:
+        results = _parse_chunk(filepaths, mode)
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        chunk_size = chunk_size or max(1, -(-len(filepaths) // (workers * 4)))
+        chunks = [filepaths[i:i + chunk_size] for i in range(0, len(filepaths), chunk_size)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                 mp_context=multiprocessing.get_context(method)) as pool:
+            results = [r for chunk in pool.map(_parse_chunk, chunks, [mode] * len(chunks)) for r in chunk]
+
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            if not skip_errors:
+                raise result
+            print(f"⚠️ Failed to parse {filepaths[i]}: {result}")
+            results[i] = []
+    return results
+
+
 if __name__ == "__main__":
     import sys
 
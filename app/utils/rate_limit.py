@@ -0,0 +1,267 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from app.utils.telemetry import count
+
+# Provider limits for the whole process; 0 means unlimited
+LLM_RPM = int(os.getenv("LLM_RPM", "0"))
+LLM_TPM = int(os.getenv("LLM_TPM", "0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+# Statuses that mean "you are sending too much": these shrink the concurrency limit
+THROTTLE_STATUS = {429, 503, 529}
+
+
+def _status_code(exc):
+    for owner in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status", "code"):
+            value = getattr(owner, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def retry_reason(exc):
+    """
+    Why `exc` is worth retrying ("rate_limited", "server_error", "connection"),
+    or None if it isn't. Works on OpenAI SDK errors, httpx/urllib HTTP errors
+    and plain connection errors without importing any of them.
+    """
+    status = _status_code(exc)
+    if status is not None:
+        if status not in RETRYABLE_STATUS:
+            return None
+        return "rate_limited" if status in THROTTLE_STATUS else "server_error"
+    if isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return "connection"
+    return None
+
+
+def retry_after(exc):
+    """Seconds the server asked us to wait (Retry-After header), if any."""
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after") or headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units evenly over a minute, holding at most one
+    minute's worth. `take` reserves units and returns how long the caller
+    must sleep before using them; the balance may go negative, so
+    concurrent callers queue up fairly instead of all waking at once.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount=1) -> float:
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, amount):
+        """Give back (positive) or charge (negative) units once the real cost is known."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self, seconds):
+        """Pause refills for `seconds`, e.g. after the server says we're over the limit."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AIMDLimit:
+    """
+    Concurrency limit that grows by one after a window of successful calls
+    (one per slot) and halves when the server throttles us, between
+    `minimum` and `maximum`. Decreases are at most one per `cooldown`
+    seconds, so a burst of 429s from calls already in flight counts once.
+    """
+
+    def __init__(self, maximum, minimum=1, initial=None, decrease=0.5, cooldown=1.0):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(min(self.maximum, initial or self.maximum))
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        """
+        `acquire` for coroutines. The wait runs in a worker thread that can't
+        be interrupted, so if the caller is cancelled meanwhile, the slot the
+        thread eventually takes is handed straight back.
+        """
+        waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            waiter.add_done_callback(lambda f: self.release() if not f.cancelled() and f.exception() is None else None)
+            raise
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(1.0, self.limit))
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._last_decrease = now
+
+    def resize(self, maximum):
+        """
+        Change the ceiling. Raising it scales the current limit up by the
+        same factor (an unthrottled limit goes straight to the new maximum);
+        lowering it clamps the limit.
+        """
+        with self._cond:
+            previous = self.maximum
+            self.maximum = max(1, maximum)
+            self.minimum = min(self.minimum, self.maximum)
+            if self.maximum > previous:
+                self.limit *= self.maximum / previous
+            self.limit = min(float(self.maximum), max(self.limit, float(self.minimum)))
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    Process-wide gate in front of every LLM request.
+
+    Each attempt waits for a slot of the adaptive concurrency limit and for
+    the requests-per-minute and tokens-per-minute buckets (`rpm` / `tpm`,
+    0 = unlimited), then runs. Throttling (429/503) and other transient
+    failures (5xx, timeouts, dropped connections) are retried up to
+    `max_retries` times with full-jitter exponential backoff, honouring
+    Retry-After; throttling also halves the concurrency limit, which then
+    creeps back up as calls succeed. Retries are counted in `llm.retries`.
+    """
+
+    def __init__(self, max_concurrency=8, rpm=LLM_RPM, tpm=LLM_TPM, max_retries=LLM_MAX_RETRIES,
+                 base_delay=0.5, max_delay=30.0, min_concurrency=1):
+        self.concurrency = AIMDLimit(max_concurrency, minimum=min_concurrency)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt, exc):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hinted = retry_after(exc)
+        return max(delay, hinted) if hinted is not None else delay
+
+    def _admit(self, tokens) -> float:
+        """Seconds to wait for the rate buckets before sending a request of ~`tokens`."""
+        wait = self.requests.take(1) if self.requests else 0.0
+        if self.tokens:
+            wait = max(wait, self.tokens.take(tokens))
+        return wait
+
+    def _settle(self, estimate, used):
+        if self.tokens and used:
+            self.tokens.adjust(estimate - used)
+
+    def _failed(self, exc, attempt, model):
+        """Backoff delay before retrying after `exc`; re-raises if it isn't retryable or retries ran out."""
+        reason = retry_reason(exc)
+        if reason is None or attempt >= self.max_retries:
+            raise exc
+        if reason == "rate_limited":
+            self.concurrency.on_throttle()
+            delay = self._backoff(attempt, exc)
+            if self.requests:
+                self.requests.drain(delay)
+        else:
+            delay = self._backoff(attempt, exc)
+        count("llm.retries", attributes={"reason": reason, "llm.model": model})
+        return delay
+
+    def call(self, fn, tokens=0, model=None, usage=None):
+        """
+        Run `fn()` under the limits, retrying transient failures. Returns
+        (result, seconds spent waiting, attempts). `usage(result)` gives the
+        real token count, to correct the `tokens` estimate.
+        """
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            self.concurrency.acquire()
+            try:
+                delay = self._admit(tokens)
+                if delay:
+                    time.sleep(delay)
+                waited += time.perf_counter() - start
+                try:
+                    result = fn()
+                except Exception as e:
+                    retry_in = self._failed(e, attempt, model)
+                else:
+                    self.concurrency.on_success()
+                    self._settle(tokens, usage(result) if usage else 0)
+                    return result, waited, attempt + 1
+            finally:
+                self.concurrency.release()
+            time.sleep(retry_in)
+            waited += retry_in
+
+    async def acall(self, fn, tokens=0, model=None, usage=None):
+        """Async variant of `call`: `fn()` returns an awaitable."""
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            await self.concurrency.aacquire()
+            try:
+                delay = self._admit(tokens)
+                if delay:
+                    await asyncio.sleep(delay)
+                waited += time.perf_counter() - start
+                try:
+                    result = await fn()
+                except Exception as e:
+                    retry_in = self._failed(e, attempt, model)
+                else:
+                    self.concurrency.on_success()
+                    self._settle(tokens, usage(result) if usage else 0)
+                    return result, waited, attempt + 1
+            finally:
+                self.concurrency.release()
+            await asyncio.sleep(retry_in)
+            waited += retry_in
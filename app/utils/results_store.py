@@ -0,0 +1,258 @@
+import copy
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from app.utils.git_diff import head_commit
+
+DEFAULT_RESULTS_PATH = os.getenv("RESULTS_DB_PATH", ".cache/results.sqlite")
+
+# Bumped when the schema changes; older stores are dropped (they only hold reusable outputs)
+STORE_VERSION = 2
+
+# Default content hash for repo-level outputs (no block); callers pass a digest of what they read instead
+REPO_LEVEL = "*"
+
+# agent -> report section title, in report order
+SECTION_TITLES = {
+    "analyzer": "🧠 Analyzer Output",
+    "documenter": "📘 Documenter Output",
+    "summary": "📘 File-level Summary",
+    "qa": "🧪 QA Review",
+    "tester": "🧬 Generated Tests",
+    "readme": "📄 Generated README",
+}
+
+
+def prompt_version(prompt, llm=None) -> str:
+    """Short hash of a prompt template (and model), so editing either invalidates old results."""
+    template = getattr(prompt, "template", str(prompt))
+    model = getattr(llm, "model_name", "") if llm is not None else ""
+    return hashlib.sha1(f"{model}\x00{template}".encode("utf-8")).hexdigest()[:12]
+
+
+def block_hash(block) -> str:
+    return hashlib.sha1((block.get("code") or "").encode("utf-8")).hexdigest()
+
+
+def _location(block) -> tuple:
+    """(file, qualname) of a block; ("", "") for repo-level outputs."""
+    block = block or {}
+    return block.get("file") or "", block.get("qualname") or block.get("name") or ""
+
+
+class ResultsStore:
+    """
+    SQLite store of agent outputs, one row per
+    (repo, commit, agent, block location, block content hash, prompt version).
+
+    Agents record each result as soon as it is produced and skip blocks
+    whose content already has one (wherever it was), so a crashed or
+    interrupted run resumes with only the remaining work. Failed blocks
+    are never stored, so they are retried. A store `scoped` to a run (e.g.
+    a job ID) also remembers which rows that run produced or reused, so
+    its report can be rebuilt from here without other runs' rows.
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_PATH):
+        self.path = path
+        self.run = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version < STORE_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS results")
+            self._conn.execute("DROP TABLE IF EXISTS run_results")
+            self._conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                repo TEXT NOT NULL,
+                commit_sha TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                file TEXT NOT NULL,
+                qualname TEXT NOT NULL,
+                block_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                name TEXT,
+                type TEXT,
+                lineno INTEGER,
+                output TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (repo, commit_sha, agent, file, qualname, block_hash, prompt_version)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS run_results (
+                run TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                commit_sha TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                file TEXT NOT NULL,
+                qualname TEXT NOT NULL,
+                block_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                PRIMARY KEY (run, repo, commit_sha, agent, file, qualname, block_hash, prompt_version)
+            )
+        """)
+        self._conn.commit()
+
+    def scoped(self, run):
+        """A view of this store (same database) that tags every row it writes or reuses with `run`."""
+        view = copy.copy(self)
+        view.run = run
+        return view
+
+    def get(self, repo, commit, agent, digest, version):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output FROM results WHERE repo = ? AND commit_sha = ? AND agent = ? "
+                "AND block_hash = ? AND prompt_version = ? LIMIT 1",
+                (repo, commit or "", agent, digest, version),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, repo, commit, agent, digest, version, output, block=None, replace=True):
+        """
+        Store `output` for `block`'s location (repo-level if None). With
+        `replace=False`, an existing row for that location is kept, e.g.
+        when a result is reused from identical code elsewhere.
+        """
+        file, qualname = _location(block)
+        block = block or {}
+        key = (repo, commit or "", agent, file, qualname, digest, version)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (block.get("name"), block.get("type"), block.get("lineno"), output, time.time()),
+            )
+            if self.run is not None:
+                self._conn.execute("INSERT OR IGNORE INTO run_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (self.run,) + key)
+            self._conn.commit()
+
+    def recorder(self, repo_path, agent, version, repo=None, commit=None):
+        """Recorder bound to one agent run over `repo_path` (repo/commit default to the checkout's)."""
+        from app.retriever.indexer import repo_key
+
+        return ResultRecorder(self, repo or repo_key(repo_path), commit or head_commit(repo_path), agent, version)
+
+    def rows(self, repo, commit, agents=None, run=None) -> list:
+        """
+        Stored results for a commit, one per (agent, block location), in
+        report order. With `run`, only the rows that run produced or reused
+        (so its own files, diff and prompt versions); otherwise the latest
+        row per location, and per agent for repo-level outputs.
+        """
+        query = "SELECT r.agent, r.file, r.qualname, r.name, r.type, r.lineno, r.output FROM results r"
+        params = [repo, commit or ""]
+        if run is not None:
+            query += (" JOIN run_results m ON m.repo = r.repo AND m.commit_sha = r.commit_sha AND m.agent = r.agent"
+                      " AND m.file = r.file AND m.qualname = r.qualname AND m.block_hash = r.block_hash"
+                      " AND m.prompt_version = r.prompt_version AND m.run = ?")
+            params.insert(0, run)
+        query += " WHERE r.repo = ? AND r.commit_sha = ? ORDER BY r.created_at"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        latest = {}
+        for agent, file, qualname, name, type_, lineno, output in rows:
+            if agents is None or agent in agents:
+                latest[(agent, file, qualname)] = {"agent": agent, "file": file or None, "qualname": qualname,
+                                                   "name": name, "type": type_, "lineno": lineno, "output": output}
+        order = list(SECTION_TITLES)
+        return sorted(latest.values(), key=lambda r: (order.index(r["agent"]) if r["agent"] in order else len(order),
+                                                      r["file"] or "", r["lineno"] or 0))
+
+    def sections(self, repo, commit, agents=None, run=None) -> dict:
+        """{section title: text} for a commit (and `run`, see rows), ready for the UI or generate_pdf_report."""
+        sections = {}
+        for row in self.rows(repo, commit, agents, run):
+            title = SECTION_TITLES.get(row["agent"], row["agent"])
+            if row["file"] is None:
+                text = row["output"]
+            else:
+                text = f"{row['type']} `{row['qualname']}` ({row['file']}:{row['lineno']})\n{row['output']}"
+            sections[title] = f"{sections[title]}\n\n{text}" if title in sections else text
+        return sections
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        return {"entries": size}
+
+
+class ResultRecorder:
+    """One agent's view of the store for a given repo, commit and prompt version."""
+
+    def __init__(self, store, repo, commit, agent, version):
+        self.store = store
+        self.repo = repo
+        self.commit = commit
+        self.agent = agent
+        self.version = version
+        self.reused = 0
+
+    def lookup(self, block):
+        output = self.store.get(self.repo, self.commit, self.agent, block_hash(block), self.version)
+        if output is None:
+            return None
+        self.reused += 1
+        # Identical code may have been answered at another location: file it under this one too
+        self.store.put(self.repo, self.commit, self.agent, block_hash(block), self.version, output, block,
+                       replace=False)
+        return {"block": block, "output": output, "error": None}
+
+    def record(self, result):
+        if result["error"] is None and result["output"] is not None:
+            block = result["block"]
+            self.store.put(self.repo, self.commit, self.agent, block_hash(block), self.version, result["output"], block)
+
+    def once(self, fn, key=REPO_LEVEL):
+        """Stored output for a repo-level step, or run `fn()` and store it (unless it reports a failure)."""
+        output = self.store.get(self.repo, self.commit, self.agent, key, self.version)
+        if output is not None:
+            self.reused += 1
+            self.store.put(self.repo, self.commit, self.agent, key, self.version, output, replace=False)
+            return output
+        output = fn()
+        if isinstance(output, str) and not output.lstrip().startswith(("❌", "⚠️")):
+            self.store.put(self.repo, self.commit, self.agent, key, self.version, output)
+        return output
+
+
+def iter_resumed(recorder, blocks, produce):
+    """
+    Yield one result per block, in order: stored ones straight from
+    `recorder`, the rest from `produce(missing_blocks)` (which must yield one
+    result per block, in order), recording each as it arrives.
+    """
+    if recorder is None:
+        yield from produce(blocks)
+        return
+
+    stored = [recorder.lookup(block) for block in blocks]
+    fresh = produce([block for block, result in zip(blocks, stored) if result is None])
+    for result in stored:
+        if result is None:
+            result = next(fresh)
+            recorder.record(result)
+        yield result
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_results_store():
+    """Return the process-wide results store, or None when disabled via RESULTS_STORE_DISABLED=1."""
+    global _store
+    if os.getenv("RESULTS_STORE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+        return _store
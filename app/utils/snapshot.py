@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+
+from app.utils.file_utils import collect_supported_files
+from app.utils.git_diff import changed_hunks, head_commit
+from app.utils.parser import parse_many
+from app.utils.telemetry import count, span
+
+SNAPSHOT_DIR = os.path.join(".cache", "snapshots")
+SNAPSHOT_VERSION = 2
+
+# Blocks are stored as tuples in this field order; "file" is implied by the key
+_BLOCK_FIELDS = ("name", "type", "lineno", "end_lineno", "qualname", "parent", "code", "source")
+
+
+def _file_hash(filepath):
+    h = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def default_snapshot_path(repo_path):
+    """One file per checkout: the folder name plus a hash of its absolute path, so same-named repos don't collide."""
+    repo_path = os.path.abspath(repo_path)
+    digest = hashlib.sha1(repo_path.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(SNAPSHOT_DIR, f"{os.path.basename(repo_path)}-{digest}.json")
+
+
+class RepoSnapshot:
+    """
+    A repo walked and parsed once, shared by every agent in a run.
+
+    Blocks are kept per file as compact tuples and only expanded into the
+    parser's dict shape on access. A manifest of mtime/size/sha1 per file
+    lets `build` re-parse only the files touched since the last save.
+    `build` also records the checkout's commit and, with `base_ref`, its
+    changed hunks, so later stages don't re-read a checkout that another
+    job may have reset since.
+    """
+
+    def __init__(self, repo_path, manifest=None, blocks=None, mode="nested"):
+        self.repo_path = repo_path
+        self.mode = mode                # parse_python_file mode the blocks were built with
+        self.manifest = manifest or {}  # relpath -> {"mtime", "size", "sha1"}
+        self._blocks = blocks or {}     # relpath -> [tuple, ...]
+        self.commit = None              # HEAD when built (None outside git)
+        self.base_ref = None
+        self.hunks = None               # changed_hunks(repo_path, base_ref) when built with one
+
+    @classmethod
+    def build(cls, repo_path, snapshot_path=None, persist=True, mode="nested", workers=None, base_ref=None):
+        """Walk and parse `repo_path`, reusing unchanged files from a saved snapshot."""
+        snapshot_path = snapshot_path or default_snapshot_path(repo_path)
+        previous = cls.load(snapshot_path, repo_path) if persist else None
+        if previous is not None and previous.mode != mode:
+            previous = None
+        snapshot = cls(repo_path, mode=mode)
+        snapshot.commit = head_commit(repo_path)
+        if base_ref is not None:
+            snapshot.base_ref = base_ref
+            snapshot.hunks = changed_hunks(repo_path, base_ref)
+        to_parse = []
+
+        for filepath in collect_supported_files(repo_path):
+            relpath = os.path.relpath(filepath, repo_path)
+            st = os.stat(filepath)
+            entry = {"mtime": st.st_mtime, "size": st.st_size}
+            old = previous.manifest.get(relpath) if previous else None
+
+            if old and old["mtime"] == entry["mtime"] and old["size"] == entry["size"]:
+                snapshot.manifest[relpath] = old
+                snapshot._blocks[relpath] = previous._blocks.get(relpath, [])
+                continue
+
+            entry["sha1"] = _file_hash(filepath)
+            snapshot.manifest[relpath] = entry
+            if old and old.get("sha1") == entry["sha1"]:
+                # Touched but unchanged (e.g. fresh checkout): keep the parsed blocks
+                snapshot._blocks[relpath] = previous._blocks.get(relpath, [])
+                continue
+
+            to_parse.append((relpath, filepath))
+
+        # Changed files are parsed together so large repos can use the process pool
+        with span("parse", {"repo.path": repo_path, "parse.mode": mode}) as current:
+            parsed = parse_many([filepath for _, filepath in to_parse], mode=mode, workers=workers, skip_errors=True)
+            for (relpath, _), blocks in zip(to_parse, parsed):
+                snapshot._blocks[relpath] = [tuple(b.get(k) for k in _BLOCK_FIELDS) for b in blocks]
+            n_blocks = sum(len(blocks) for blocks in parsed)
+            current.set_attributes({"files": len(snapshot.manifest), "files.parsed": len(to_parse),
+                                    "files.reused": len(snapshot.manifest) - len(to_parse), "blocks": n_blocks})
+        count("blocks.parsed", n_blocks, {"parse.mode": mode})
+
+        print(f"🧩 Snapshot: {len(snapshot.manifest)} files, {len(to_parse)} parsed, "
+              f"{len(snapshot.manifest) - len(to_parse)} reused")
+        if persist:
+            snapshot.save(snapshot_path)
+        return snapshot
+
+    @classmethod
+    def load(cls, snapshot_path, repo_path=None):
+        """Load a saved snapshot, or return None if missing/unreadable/outdated."""
+        try:
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != SNAPSHOT_VERSION:
+            return None
+        blocks = {rel: [tuple(b) for b in items] for rel, items in data["blocks"].items()}
+        return cls(repo_path or data["repo_path"], manifest=data["manifest"], blocks=blocks, mode=data["mode"])
+
+    def save(self, snapshot_path):
+        if os.path.dirname(snapshot_path):
+            os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "repo_path": self.repo_path,
+                "mode": self.mode,
+                "manifest": self.manifest,
+                "blocks": self._blocks,
+            }, f)
+        os.replace(tmp_path, snapshot_path)
+
+    @property
+    def digest(self) -> str:
+        """Hash of every file's path and content (and the parse mode): changes whenever the tree does."""
+        h = hashlib.sha1(self.mode.encode("utf-8"))
+        for relpath in sorted(self.manifest):
+            h.update(f"\0{relpath}\0{self.manifest[relpath]['sha1']}".encode("utf-8"))
+        return h.hexdigest()
+
+    def file_digest(self, filepath) -> str:
+        """Content hash of one file, from the manifest."""
+        return self.manifest[os.path.relpath(filepath, self.repo_path)]["sha1"]
+
+    @property
+    def files(self):
+        """File paths in discovery order, formatted like collect_supported_files."""
+        return [os.path.join(self.repo_path, rel) for rel in self.manifest]
+
+    def blocks_for(self, filepath):
+        """Parsed blocks of one file, in the same dict shape as parse_file_by_type."""
+        relpath = os.path.relpath(filepath, self.repo_path)
+        full_path = os.path.join(self.repo_path, relpath)
+        return [dict(zip(_BLOCK_FIELDS, b), file=full_path) for b in self._blocks.get(relpath, [])]
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from opentelemetry import context as otel_context
+from opentelemetry import metrics, trace
+
+# "" (off: the OpenTelemetry API stays a no-op), "console" (stdout) or "json" (JSON lines in TELEMETRY_PATH)
+TELEMETRY_EXPORTER = os.getenv("TELEMETRY_EXPORTER", "")
+TELEMETRY_PATH = os.getenv("TELEMETRY_PATH", os.path.join(".cache", "telemetry.jsonl"))
+METRIC_EXPORT_INTERVAL_MS = 10_000
+
+PREFIX = "codebase_companion"
+
+# name -> (kind, unit, description); created lazily on the global meter
+INSTRUMENTS = {
+    "duration": ("histogram", "s", "Wall time of a traced operation, by operation name"),
+    "files.discovered": ("counter", "{file}", "Supported files found while walking a repo"),
+    "files.skipped": ("counter", "{file}", "Supported files left out while walking a repo, by reason"),
+    "blocks.parsed": ("counter", "{block}", "Blocks produced by the parsers"),
+    "blocks.deduplicated": ("counter", "{block}", "Near-duplicate blocks answered by their representative's LLM call"),
+    "blocks.embedded": ("counter", "{block}", "Blocks sent to the embedding model"),
+    "retrieval.results": ("counter", "{document}", "Documents returned by the retriever"),
+    "llm.calls": ("counter", "{call}", "LLM requests sent (cache hits excluded)"),
+    "llm.tokens": ("counter", "{token}", "LLM tokens by kind (prompt/completion)"),
+    "llm.cache": ("counter", "{lookup}", "LLM cache lookups by result (hit/miss)"),
+    "llm.retries": ("counter", "{retry}", "LLM requests re-sent, by reason"),
+    "llm.queue_wait": ("histogram", "s", "Time an LLM call waited for the in-flight budget, rate limits and retry backoff"),
+}
+
+_lock = threading.Lock()
+_configured = None  # (tracer_provider, meter_provider) once set up
+_instruments = {}
+
+
+def setup_telemetry(exporter=None, path=None):
+    """
+    Install SDK tracer and meter providers once per process.
+
+    Both exporters work offline: "console" prints spans and metrics to
+    stdout, "json" appends them as JSON lines to `path`. Without an
+    exporter nothing is installed and every span/metric below is a no-op.
+    """
+    global _configured
+    exporter = TELEMETRY_EXPORTER if exporter is None else exporter
+    if not exporter:
+        return
+    with _lock:
+        if _configured is not None:
+            return
+
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if exporter == "console":
+            span_exporter, metric_exporter = ConsoleSpanExporter(), ConsoleMetricExporter()
+        elif exporter == "json":
+            path = path or TELEMETRY_PATH
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            out = open(path, "a", encoding="utf-8")
+            span_exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+            metric_exporter = ConsoleMetricExporter(out=out, formatter=lambda data: data.to_json(indent=None) + "\n")
+        else:
+            raise ValueError(f"Unknown telemetry exporter: {exporter}")
+
+        resource = Resource.create({"service.name": "codebase-companion"})
+        tracer_provider = TracerProvider(resource=resource)
+        tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        meter_provider = MeterProvider(resource=resource, metric_readers=[
+            PeriodicExportingMetricReader(metric_exporter, export_interval_millis=METRIC_EXPORT_INTERVAL_MS)])
+
+        trace.set_tracer_provider(tracer_provider)
+        metrics.set_meter_provider(meter_provider)
+        _configured = (tracer_provider, meter_provider)
+
+
+def flush_telemetry():
+    """Export buffered spans and metrics now (e.g. at the end of a run)."""
+    if _configured is not None:
+        for provider in _configured:
+            provider.force_flush()
+
+
+def _instrument(name):
+    with _lock:
+        if name not in _instruments:
+            kind, unit, description = INSTRUMENTS[name]
+            meter = metrics.get_meter(PREFIX)
+            create = meter.create_histogram if kind == "histogram" else meter.create_counter
+            _instruments[name] = create(f"{PREFIX}.{name}", unit=unit, description=description)
+        return _instruments[name]
+
+
+def count(name, value=1, attributes=None):
+    if value:
+        _instrument(name).add(value, attributes=_clean(attributes))
+
+
+def record(name, value, attributes=None):
+    _instrument(name).record(value, attributes=_clean(attributes))
+
+
+def _clean(attributes):
+    # Span/metric attributes cannot be None
+    return {k: v for k, v in (attributes or {}).items() if v is not None}
+
+
+@contextmanager
+def span(name, attributes=None):
+    """
+    Trace a block of work as `name` and record its wall time in the
+    `duration` histogram. Yields the span so callers can add attributes
+    (counts, cache results...) once they are known.
+    """
+    start = time.perf_counter()
+    with trace.get_tracer(PREFIX).start_as_current_span(name, attributes=_clean(attributes)) as current:
+        try:
+            yield current
+        finally:
+            record("duration", time.perf_counter() - start, {"operation": name})
+
+
+def annotate(attributes):
+    """Set attributes on the active span (no-op outside one)."""
+    trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def mark_error(exc):
+    """Flag the active span as failed for an exception the caller handles itself."""
+    current = trace.get_current_span()
+    current.record_exception(exc)
+    current.set_status(trace.Status(trace.StatusCode.ERROR, str(exc)))
+
+
+def block_attributes(block) -> dict:
+    return _clean({
+        "block.name": block.get("name"),
+        "block.type": block.get("type"),
+        "block.file": block.get("file"),
+        "block.lineno": block.get("lineno"),
+        "block.chars": len(block.get("code") or ""),
+    })
+
+
+def current_context():
+    """Capture the active trace context, to continue it on another thread via `use_context`."""
+    return otel_context.get_current()
+
+
+@contextmanager
+def use_context(ctx):
+    token = otel_context.attach(ctx)
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
@@ -2,9 +2,17 @@
 
 import sys
 
-# Torch might not be installed yet — don't crash
-try:
-    import torch
+
+def patch_torch_classes():
+    """
+    Work around the Streamlit file-watcher crash on `torch.classes`.
+
+    Only acts if torch has already been imported (by the torch embedding
+    backend), so importing this module never loads torch itself.
+    """
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
 
     # Remove the faulty attribute that causes Streamlit crash
     if hasattr(torch, "classes") and "__path__" in dir(torch.classes):
@@ -18,6 +26,3 @@ try:
         torch.classes = None
         if "torch.classes" in sys.modules:
             del sys.modules["torch.classes"]
-
-except ImportError:
-    pass
@@ -0,0 +1,80 @@
+"""
+Compare the onnxruntime and torch embedding backends on a real repo.
+
+    python -m benchmarks.embeddings data/repos/psf_requests [--quantize] [--threads 4]
+
+Reports documents/second for each backend plus how closely the ONNX path
+agrees with torch: mean/min cosine similarity of matching vectors and the
+top-k overlap of nearest-neighbour results for sample queries.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.retriever.indexer import build_index_entries
+
+QUERIES = [
+    "Find logic issues or code smells",
+    "where are HTTP requests sent",
+    "configuration loading",
+    "error handling and retries",
+    "unit tests",
+]
+
+
+def _timed_embed(embeddings, texts):
+    start = time.perf_counter()
+    vectors = np.array(embeddings.embed_documents(texts))
+    return vectors, time.perf_counter() - start
+
+
+def _top_k(doc_vectors, query_vectors, k):
+    scores = query_vectors @ doc_vectors.T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def run(repo_path, quantize=False, threads=None, k=4, limit=None):
+    texts = [text for text, _ in build_index_entries(repo_path).values()][:limit]
+
+    from app.retriever.onnx_embeddings import OnnxEmbeddings
+
+    start = time.perf_counter()
+    onnx = OnnxEmbeddings(quantize=quantize, num_threads=threads)
+    onnx_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    torch_model = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5",
+                                        encode_kwargs={"normalize_embeddings": True})
+    torch_load = time.perf_counter() - start
+
+    onnx_vectors, onnx_seconds = _timed_embed(onnx, texts)
+    torch_vectors, torch_seconds = _timed_embed(torch_model, texts)
+
+    cosines = np.sum(onnx_vectors * torch_vectors, axis=1)
+    onnx_top = _top_k(onnx_vectors, np.array(onnx.embed_documents(QUERIES)), k)
+    torch_top = _top_k(torch_vectors, np.array(torch_model.embed_documents(QUERIES)), k)
+    overlap = [len(a & b) / k for a, b in zip(onnx_top, torch_top)]
+
+    return {
+        "documents": len(texts),
+        "onnx": {"load_s": round(onnx_load, 3), "embed_s": round(onnx_seconds, 3),
+                 "docs_per_s": round(len(texts) / onnx_seconds, 1), "quantized": quantize},
+        "torch": {"load_s": round(torch_load, 3), "embed_s": round(torch_seconds, 3),
+                  "docs_per_s": round(len(texts) / torch_seconds, 1)},
+        "agreement": {"mean_cosine": round(float(cosines.mean()), 5), "min_cosine": round(float(cosines.min()), 5),
+                      f"top{k}_overlap": round(float(np.mean(overlap)), 3)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repo_path")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None, help="embed at most this many blocks")
+    args = parser.parse_args()
+    print(json.dumps(run(args.repo_path, args.quantize, args.threads, limit=args.limit), indent=2))
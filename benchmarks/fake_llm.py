@@ -0,0 +1,96 @@
+"""
+Deterministic stand-in for ChatOpenAI, so agents can be benchmarked offline.
+
+Install it with `app.utils.llm.set_llm_factory(fake_llm_factory(...))`; every
+agent then gets a FakeChatModel from get_llm. Replies depend only on the
+prompt, each call sleeps `latency` seconds, and calls still go through the
+shared rate limiter, like the real model.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.utils.llm import BudgetedLLMMixin
+
+BLOCK_ID_RE = re.compile(r'<block id="(\d+)">')
+
+
+class CallLog:
+    """Thread-safe record of fake LLM call durations (budget wait included)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = []
+
+    def record(self, seconds):
+        with self._lock:
+            self.durations.append(seconds)
+
+    def drain(self):
+        with self._lock:
+            durations, self.durations = self.durations, []
+        return durations
+
+
+def fake_reply(prompt: str) -> str:
+    """Deterministic reply; batched prompts get one <result> per <block>."""
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+    ids = BLOCK_ID_RE.findall(prompt)
+    if ids:
+        return "\n".join(f'<result id="{i}">- fake finding {digest}/{i}</result>' for i in ids)
+    return f'"""Fake response {digest}."""\n- fake finding {digest}'
+
+
+class _FakeChat(BaseChatModel):
+    model_name: str = "gpt-3.5-turbo"
+    temperature: float = 0.0
+    latency: float = 0.05
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages):
+        prompt = "\n".join(str(m.content) for m in messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=fake_reply(prompt)))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+class FakeChatModel(BudgetedLLMMixin, _FakeChat):
+    log: Any = None
+
+    def _generate(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super()._generate(*args, **kwargs)
+        finally:
+            if self.log is not None:
+                self.log.record(time.perf_counter() - start)
+
+    async def _agenerate(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super()._agenerate(*args, **kwargs)
+        finally:
+            if self.log is not None:
+                self.log.record(time.perf_counter() - start)
+
+
+def fake_llm_factory(latency=0.05, log=None):
+    """Factory for set_llm_factory; the real response cache is bypassed."""
+    return lambda model, temperature: FakeChatModel(model_name=model, temperature=temperature,
+                                                    latency=latency, log=log, cache=False)
@@ -0,0 +1,87 @@
+"""
+Cold-start import check for the CLI entry points.
+
+    python -m benchmarks.import_time                 # report, exit 1 on regression
+    python -m benchmarks.import_time --budget 0.8 --top 15
+
+Each entry point is imported in fresh interpreters under `-X importtime`.
+The check fails (exit code 1) when the median cumulative import time
+exceeds `--budget` seconds, or when any module in HEAVY_MODULES is loaded
+at import time: those must only be imported by the stage that uses them.
+The module check is machine-independent, so it is the part to rely on in CI.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = ("main", "app.chains.review_chain", "app.chains.jobs", "app.chains.batch")
+
+# Never needed just to start the CLI or declare the pipeline
+HEAVY_MODULES = (
+    "torch", "transformers", "sentence_transformers", "langchain_huggingface",
+    "chromadb", "langchain_chroma", "onnxruntime",
+    "langchain", "langchain_openai", "openai", "nbformat", "tiktoken", "reportlab",
+)
+
+DEFAULT_BUDGET_S = 1.0
+
+_PROBE = "import sys, json; import {module}; print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))"
+
+
+def _parse_importtime(stderr):
+    """{module: cumulative seconds} from `-X importtime` output (top-level imports only)."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cum.isdigit():
+            cumulative[name] = max(cumulative.get(name, 0), int(cum) / 1e6)
+    return cumulative
+
+
+def measure(module, runs=5):
+    """Median cumulative import time of `module`, the heavy modules it loaded and its slowest imports."""
+    durations, loaded, slowest = [], [], {}
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr.splitlines()[-1] if proc.stderr else ''}")
+        timings = _parse_importtime(proc.stderr)
+        durations.append(timings.get(module, 0.0))
+        loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+        slowest = timings
+    return statistics.median(durations), loaded, slowest
+
+
+def run(budget=DEFAULT_BUDGET_S, runs=5, top=10, entry_points=ENTRY_POINTS):
+    report, ok = {}, True
+    for module in entry_points:
+        seconds, loaded, timings = measure(module, runs)
+        over_budget = seconds > budget
+        ok = ok and not over_budget and not loaded
+        report[module] = {
+            "median_s": round(seconds, 4),
+            "budget_s": budget,
+            "over_budget": over_budget,
+            "heavy_modules_loaded": loaded,
+            "slowest": {name: round(s, 4) for name, s in
+                        sorted(timings.items(), key=lambda item: -item[1])[:top] if name != module},
+        }
+    return report, ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_S, help="max median import seconds")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per entry point")
+    args = parser.parse_args()
+
+    report, ok = run(args.budget, args.runs, args.top)
+    print(json.dumps(report, indent=2))
+    print("✅ Import time within budget" if ok else "❌ Import-time regression", file=sys.stderr)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,247 @@
+"""
+Offline, end-to-end benchmark of the pipeline on a synthetic repo.
+
+    python -m benchmarks.pipeline --py-files 200 --latency 0.05 --output bench.json
+    python -m benchmarks.pipeline --compare bench.json     # rerun and diff against a baseline
+
+Every agent gets a deterministic fake chat model (see benchmarks.fake_llm)
+and embeddings default to the "fake" hash backend, so nothing is downloaded
+or billed; set EMBEDDING_BACKEND=onnx to include real embedding cost.
+Discovery, per-file parsing, indexing (cold and warm), each agent and
+run_pipeline are timed; the JSON report has seconds, throughput, peak
+traced memory and p50/p95 latencies. Inputs are generated from a fixed
+seed and everything runs in a throwaway working directory, so reports
+from different commits are directly comparable.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("EMBEDDING_BACKEND", "fake")
+
+from benchmarks.fake_llm import CallLog, fake_llm_factory
+from benchmarks.synthetic import make_repo
+
+# Metrics where a larger value is a regression, for --compare
+LOWER_IS_BETTER = ("seconds", "p50_ms", "p95_ms", "peak_mb")
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p95_ms": None}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50_ms": round(pick(0.50) * 1000, 3), "p95_ms": round(pick(0.95) * 1000, 3)}
+
+
+def _measure(fn):
+    """Run fn() quietly; return (result, seconds, peak traced MB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, round(seconds, 4), round(peak / 2**20, 2)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        return None
+
+
+def bench_discovery(repo, repeats=5):
+    from app.utils.file_utils import collect_supported_files
+
+    durations, files = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        files = collect_supported_files(repo)
+        durations.append(time.perf_counter() - start)
+    _, seconds, peak = _measure(lambda: collect_supported_files(repo))
+    return files, {"files": len(files), "seconds": seconds, "files_per_s": round(len(files) / max(seconds, 1e-9), 1),
+                   "peak_mb": peak, **_percentiles(durations)}
+
+
+def bench_parse(files):
+    from app.utils.parser import parse_file_by_type
+
+    durations = []
+
+    def parse_all():
+        blocks = 0
+        for f in files:
+            start = time.perf_counter()
+            blocks += len(parse_file_by_type(f))
+            durations.append(time.perf_counter() - start)
+        return blocks
+
+    blocks, seconds, peak = _measure(parse_all)
+    return {"files": len(files), "blocks": blocks, "seconds": seconds,
+            "files_per_s": round(len(files) / max(seconds, 1e-9), 1),
+            "blocks_per_s": round(blocks / max(seconds, 1e-9), 1), "peak_mb": peak, **_percentiles(durations)}
+
+
+def bench_index(repo, snapshot):
+    from app.retriever.indexer import index_repository
+
+    report = {}
+    for run in ("cold", "warm"):
+        stats, seconds, peak = _measure(lambda: index_repository(repo, snapshot=snapshot))
+        blocks = stats["added"] + stats["unchanged"]
+        report[run] = {**stats, "seconds": seconds, "blocks_per_s": round(blocks / max(seconds, 1e-9), 1),
+                       "peak_mb": peak}
+    return report
+
+
+def bench_agents(repo, snapshot, log, max_files):
+    from app.agents.analyzer import AnalyzerAgent
+    from app.agents.documenter import DocumenterAgent
+    from app.agents.qa_agent import QAAgent
+    from app.agents.readme_agent import ReadmeAgent
+    from app.agents.tester_agent import TesterAgent
+    from app.retriever.indexer import repo_key
+
+    key = repo_key(repo)
+    runs = {
+        "analyzer": lambda: [AnalyzerAgent(repo=key).analyze("Find logic issues or code smells")],
+        "docstrings": lambda: list(DocumenterAgent(repo=key).iter_docstrings(repo, max_files, snapshot=snapshot)),
+        "summary": lambda: [DocumenterAgent(repo=key).summarize_file(snapshot.files[0], snapshot=snapshot)],
+        "qa": lambda: list(QAAgent().iter_reviews(repo, max_files, snapshot=snapshot)),
+        "tester": lambda: list(TesterAgent().iter_tests(repo, max_files, snapshot=snapshot)),
+        "readme": lambda: [ReadmeAgent().generate_readme(repo, snapshot=snapshot)],
+    }
+
+    report = {}
+    for name, fn in runs.items():
+        log.drain()
+        results, seconds, peak = _measure(fn)
+        calls = log.drain()
+        report[name] = {"results": len(results), "llm_calls": len(calls), "seconds": seconds,
+                        "results_per_s": round(len(results) / max(seconds, 1e-9), 2), "peak_mb": peak,
+                        **_percentiles(calls)}
+    return report
+
+
+def bench_pipeline(repo, log, max_files):
+    from app.chains.review_chain import run_pipeline
+    from app.retriever.vector_utils import shutdown_vectorstores
+
+    # Stores are cached by relative path; drop them so the new cwd starts empty
+    shutdown_vectorstores()
+    log.drain()
+    results, seconds, peak = _measure(lambda: run_pipeline(repo, max_files=max_files))
+    calls = log.drain()
+    return {"seconds": seconds, "peak_mb": peak, "llm_calls": len(calls), **_percentiles(calls),
+            "stages": {name: {"status": r.status, "seconds": round(r.seconds, 4)} for name, r in results.items()}}
+
+
+def run(py_files=50, notebooks=4, markdown_files=4, dockerfiles=1, latency=0.05, max_files=3, seed=0):
+    from app.utils.llm import set_llm_factory
+    from app.utils.snapshot import RepoSnapshot
+
+    log = CallLog()
+    set_llm_factory(fake_llm_factory(latency=latency, log=log))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="cc_bench_") as work:
+        repo = os.path.join(work, "synthetic_repo")
+        make_repo(repo, py_files, notebooks, markdown_files, dockerfiles, seed=seed)
+        try:
+            # chroma_db/, .cache/ and snapshots land in the throwaway dir
+            os.chdir(work)
+
+            files, discovery = bench_discovery(repo)
+            parse = bench_parse(files)
+            snapshot, snapshot_seconds, _ = _measure(lambda: RepoSnapshot.build(repo, mode="flat", persist=False))
+            index = bench_index(repo, snapshot)
+            agents = bench_agents(repo, snapshot, log, max_files)
+
+            # Fresh state so the end-to-end run indexes and parses from scratch
+            os.makedirs(os.path.join(work, "pipeline"))
+            os.chdir(os.path.join(work, "pipeline"))
+            pipeline = bench_pipeline(repo, log, max_files)
+        finally:
+            os.chdir(cwd)
+            set_llm_factory(None)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "embedding_backend": os.environ["EMBEDDING_BACKEND"],
+            "config": {"py_files": py_files, "notebooks": notebooks, "markdown_files": markdown_files,
+                       "dockerfiles": dockerfiles, "latency_s": latency, "max_files": max_files, "seed": seed},
+        },
+        "discovery": discovery,
+        "parse": parse,
+        "snapshot": {"seconds": snapshot_seconds},
+        "index": index,
+        "agents": agents,
+        "pipeline": pipeline,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _flatten(report, prefix=""):
+    for key, value in report.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(baseline, current, threshold=0.10):
+    """Lines for every lower-is-better metric that moved more than `threshold` (fractional)."""
+    old = dict(_flatten({k: v for k, v in baseline.items() if k != "meta"}))
+    lines = []
+    for name, value in _flatten({k: v for k, v in current.items() if k != "meta"}):
+        if not name.endswith(LOWER_IS_BETTER) or not old.get(name):
+            continue
+        change = (value - old[name]) / old[name]
+        if abs(change) >= threshold:
+            marker = "🔺" if change > 0 else "🔻"
+            lines.append(f"{marker} {name}: {old[name]} -> {value} ({change:+.0%})")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--py-files", type=int, default=50)
+    parser.add_argument("--notebooks", type=int, default=4)
+    parser.add_argument("--markdown", type=int, default=4)
+    parser.add_argument("--dockerfiles", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM seconds per call")
+    parser.add_argument("--max-files", type=int, default=3, help="files per per-block agent")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--compare", help="baseline report to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change worth reporting")
+    args = parser.parse_args()
+
+    report = run(args.py_files, args.notebooks, args.markdown, args.dockerfiles, args.latency, args.max_files,
+                 args.seed)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            lines = compare(json.load(f), report, args.threshold)
+        print("\n".join(lines) if lines else "✅ No changes beyond threshold", file=sys.stderr)
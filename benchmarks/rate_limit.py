@@ -0,0 +1,232 @@
+"""
+Rate limiter under simulated throttling, against a local stub of the
+OpenAI chat completions API.
+
+    python -m benchmarks.rate_limit                          # limiter vs. naive client, raw HTTP
+    python -m benchmarks.rate_limit --client chat --requests 300 --server-rps 40 --error-rate 0.05
+
+The stub server answers /v1/chat/completions after `--latency` seconds,
+returns 429 (with Retry-After) beyond `--server-rps` requests per second
+or `--server-concurrency` requests in flight, and 500 on a random
+`--error-rate` of requests. `--clients` threads (the agents) then send
+`--requests` calls, once through the shared limiter and once naively
+(fixed concurrency, no retries), and the report compares calls lost,
+throttled responses, throughput and the limiter's final concurrency.
+`--client chat` goes through BudgetedChatOpenAI (needs langchain_openai)
+instead of urllib. A last check cancels async calls mid-flight and
+while they wait for a slot (like astream_blocks on an early exit) and
+verifies every slot comes back. Exit code 1 if the limiter lost any call
+or leaked a slot.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.utils import llm as llm_utils
+from app.utils.rate_limit import RateLimiter
+
+
+class StubStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"ok": 0, "throttled": 0, "errors": 0}
+
+    def add(self, kind):
+        with self._lock:
+            self.counts[kind] += 1
+
+    def reset(self):
+        with self._lock:
+            counts, self.counts = self.counts, {"ok": 0, "throttled": 0, "errors": 0}
+        return counts
+
+
+def make_handler(stats, rps, max_in_flight, latency, error_rate, seed=0):
+    lock = threading.Lock()
+    recent = deque()
+    state = {"in_flight": 0}
+    rng = random.Random(seed)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body, headers=None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            now = time.monotonic()
+            with lock:
+                while recent and now - recent[0] > 1.0:
+                    recent.popleft()
+                throttled = len(recent) >= rps or state["in_flight"] >= max_in_flight
+                failed = not throttled and rng.random() < error_rate
+                if not throttled:
+                    recent.append(now)
+                    state["in_flight"] += 1
+
+            if throttled:
+                stats.add("throttled")
+                return self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                   {"Retry-After": "0.2"})
+            try:
+                time.sleep(latency)
+                if failed:
+                    stats.add("errors")
+                    return self._reply(500, {"error": {"message": "Internal error", "type": "server_error"}})
+                stats.add("ok")
+                self._reply(200, {
+                    "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 20, "completion_tokens": 1, "total_tokens": 21},
+                })
+            finally:
+                with lock:
+                    state["in_flight"] -= 1
+
+    return Handler
+
+
+def start_stub(stats, rps, max_in_flight, latency, error_rate):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stats, rps, max_in_flight, latency, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _post(url):
+    body = json.dumps({"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "ping"}]}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def _raw_client(base_url, limiter):
+    url = f"{base_url}/chat/completions"
+    if limiter is None:
+        return lambda: _post(url)
+    return lambda: limiter.call(lambda: _post(url), tokens=30, model="stub")[0]
+
+
+def _chat_client(base_url, limiter):
+    from langchain_core.messages import HumanMessage
+
+    chat = llm_utils.chat_model_class()(model="gpt-3.5-turbo", base_url=base_url, api_key="stub", max_retries=0,
+                                         cache=False)
+    if limiter is None:  # bypass the limiter: plain ChatOpenAI._generate, no retries
+        generate = super(llm_utils.BudgetedLLMMixin, chat)._generate
+        return lambda: generate([HumanMessage(content="ping")])
+    return lambda: chat.invoke([HumanMessage(content="ping")])
+
+
+def run_clients(call, requests, clients):
+    """Send `requests` calls from `clients` threads; returns (succeeded, lost, seconds)."""
+    def one(_):
+        try:
+            call()
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(one, range(requests)))
+    return sum(outcomes), outcomes.count(False), time.perf_counter() - start
+
+
+def check_cancellation(tasks=8, max_concurrency=2, timeout=5.0):
+    """Cancel `acall`s that are running or queued for a slot; the limiter must end with nothing in flight."""
+    limiter = RateLimiter(max_concurrency=max_concurrency)
+
+    async def scenario():
+        async def slow():
+            await asyncio.sleep(0.2)
+
+        pending = [asyncio.ensure_future(limiter.acall(slow)) for _ in range(tasks)]
+        await asyncio.sleep(0.05)  # some hold slots, the rest wait for one
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        deadline = time.monotonic() + timeout
+        while limiter.concurrency.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        leaked = limiter.concurrency.in_flight
+        # Unblock acquire threads stuck behind leaked slots, or the loop can't shut its executor down
+        limit = limiter.concurrency
+        with limit._cond:
+            limit.limit = float(tasks + max_concurrency)
+            limit._cond.notify_all()
+        return leaked
+
+    in_flight = asyncio.run(scenario())
+    return {"tasks": tasks, "in_flight_after": in_flight, "ok": in_flight == 0}
+
+
+def run(requests=200, clients=16, max_concurrency=16, server_rps=30, server_concurrency=6, latency=0.05,
+        error_rate=0.02, rpm=0, client="raw"):
+    stats = StubStats()
+    server = start_stub(stats, server_rps, server_concurrency, latency, error_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    make_client = _raw_client if client == "raw" else _chat_client
+    report = {}
+    try:
+        limiter = llm_utils.set_rate_limits(rpm=rpm, max_concurrency=max_concurrency)
+        for mode, active in (("limiter", limiter), ("naive", None)):
+            call = make_client(base_url, active)
+            # The naive client sends at the limiter's starting concurrency, without retries
+            succeeded, lost, seconds = run_clients(call, requests, clients if active else max_concurrency)
+            server_counts = stats.reset()
+            report[mode] = {
+                "succeeded": succeeded,
+                "lost": lost,
+                "seconds": round(seconds, 3),
+                "throughput_rps": round(succeeded / seconds, 2) if seconds else None,
+                "server": server_counts,
+            }
+        report["limiter"]["final_concurrency_limit"] = round(limiter.concurrency.limit, 2)
+    finally:
+        server.shutdown()
+    report["cancellation"] = check_cancellation()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16, help="threads sending calls, like concurrent agents")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="limiter's in-flight ceiling")
+    parser.add_argument("--rpm", type=int, default=0, help="limiter's requests-per-minute bucket (0 = off)")
+    parser.add_argument("--server-rps", type=int, default=30)
+    parser.add_argument("--server-concurrency", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--client", choices=("raw", "chat"), default="raw")
+    args = parser.parse_args()
+
+    report = run(args.requests, args.clients, args.max_concurrency, args.server_rps, args.server_concurrency,
+                 args.latency, args.error_rate, args.rpm, args.client)
+    print(json.dumps(report, indent=2))
+    ok = report["limiter"]["lost"] == 0 and report["cancellation"]["ok"]
+    print("✅ No calls lost under throttling, no slots leaked on cancellation" if ok
+          else "❌ Limiter lost calls or leaked slots", file=sys.stderr)
+    sys.exit(0 if ok else 1)
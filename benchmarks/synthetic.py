@@ -0,0 +1,117 @@
+"""
+Deterministic synthetic repos for offline benchmarks.
+
+    python -m benchmarks.synthetic /tmp/synth_repo --py-files 200
+
+The same arguments always produce byte-identical files, so timings taken
+on different commits measure the code, not the input.
+"""
+import argparse
+import json
+import os
+import random
+
+WORDS = [
+    "user", "order", "item", "cache", "request", "session", "token", "config", "record", "batch",
+    "payload", "client", "result", "index", "queue", "event", "report", "price", "account", "node",
+]
+
+
+def _name(rng, parts=2):
+    return "_".join(rng.choice(WORDS) for _ in range(parts))
+
+
+def _body(rng, indent, statements):
+    pad = " " * indent
+    lines = []
+    for i in range(statements):
+        var = _name(rng)
+        kind = rng.randrange(4)
+        if kind == 0:
+            lines.append(f"{pad}{var} = [x * {rng.randint(2, 9)} for x in range({rng.randint(3, 50)})]")
+        elif kind == 1:
+            lines.append(f"{pad}if {var}_{i} > {rng.randint(0, 100)}:")
+            lines.append(f"{pad}    {var}_{i} -= {rng.randint(1, 9)}")
+        elif kind == 2:
+            lines.append(f"{pad}for key, value in {{'{_name(rng, 1)}': {rng.randint(0, 9)}}}.items():")
+            lines.append(f"{pad}    total += value")
+        else:
+            lines.append(f"{pad}{var} = {{'id': {rng.randint(1, 999)}, 'name': '{_name(rng)}'}}")
+    return lines
+
+
+def python_module(rng, defs=6):
+    lines = ['"""Synthetic module."""', "import os", "import json", ""]
+    for d in range(defs):
+        if d % 3 == 2:
+            cls = "".join(w.title() for w in _name(rng).split("_")) + str(d)
+            lines += ["", f"class {cls}:", f'    """{cls} model."""', "",
+                      "    def __init__(self, value=0):", "        self.value = value", ""]
+            for m in range(rng.randint(2, 4)):
+                lines += [f"    def {_name(rng)}_{m}(self, total=0):"]
+                lines += _body(rng, 8, rng.randint(3, 12)) + ["        return total", ""]
+        else:
+            lines += ["", f"def {_name(rng)}_{d}(total=0, {_name(rng, 1)}=None):"]
+            lines += _body(rng, 4, rng.randint(4, 20)) + ["    return total", ""]
+    return "\n".join(lines) + "\n"
+
+
+def notebook(rng, cells=6):
+    nb_cells = []
+    for c in range(cells):
+        if c % 2:
+            source = "\n".join(_body(rng, 0, rng.randint(2, 8)))
+            nb_cells.append({"cell_type": "code", "execution_count": None, "metadata": {}, "outputs": [],
+                             "source": source})
+        else:
+            nb_cells.append({"cell_type": "markdown", "metadata": {}, "source": f"## {_name(rng).title()} analysis"})
+    return json.dumps({"cells": nb_cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}, indent=1)
+
+
+def markdown(rng, sections=4):
+    parts = [f"# {_name(rng).title()}\n"]
+    for _ in range(sections):
+        parts.append(f"## {_name(rng).title()}\n\n" + " ".join(rng.choice(WORDS) for _ in range(60)) + "\n")
+    return "\n".join(parts)
+
+
+def dockerfile(rng):
+    return (f"FROM python:3.11-slim\nWORKDIR /app\nCOPY requirements.txt .\n"
+            f"RUN pip install -r requirements.txt\nCOPY . .\nEXPOSE {rng.randint(8000, 8999)}\n"
+            f'CMD ["python", "main.py"]\n')
+
+
+def make_repo(root, py_files=50, notebooks=4, markdown_files=4, dockerfiles=1, defs_per_file=6, packages=5, seed=0):
+    """Write a synthetic repo under `root` and return the list of files created."""
+    rng = random.Random(seed)
+    written = []
+
+    def write(relpath, content):
+        path = os.path.join(root, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        written.append(path)
+
+    for i in range(py_files):
+        write(os.path.join(f"pkg_{i % packages}", f"module_{i}.py"), python_module(rng, defs_per_file))
+    for i in range(notebooks):
+        write(os.path.join("notebooks", f"notebook_{i}.ipynb"), notebook(rng))
+    for i in range(markdown_files):
+        write("README.md" if i == 0 else os.path.join("docs", f"page_{i}.md"), markdown(rng))
+    for i in range(dockerfiles):
+        write("Dockerfile" if i == 0 else os.path.join(f"service_{i}", "Dockerfile"), dockerfile(rng))
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root")
+    parser.add_argument("--py-files", type=int, default=50)
+    parser.add_argument("--notebooks", type=int, default=4)
+    parser.add_argument("--markdown", type=int, default=4)
+    parser.add_argument("--dockerfiles", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    files = make_repo(args.root, args.py_files, args.notebooks, args.markdown, args.dockerfiles, seed=args.seed)
+    print(f"✅ Wrote {len(files)} files to {args.root}")
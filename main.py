@@ -1,17 +1,26 @@
 import os
-from app.utils.github import download_github_repo
+import sys
 from app.chains.review_chain import run_pipeline
 
 def main():
     print("🤖 Codebase Companion")
     repo_url = input("🔗 Enter a full GitHub repo URL (e.g. https://github.com/psf/requests): ").strip()
+    if not repo_url:
+        # Without a URL run_pipeline would fall back to every repo under data/repos
+        print("❌ Error: Invalid GitHub URL. Use format: https://github.com/owner/repo")
+        return
 
     try:
-        local_path = download_github_repo(repo_url)
-        run_pipeline(repo_path=local_path, max_files=3)
+        # Clone runs as the first stage of the pipeline DAG
+        run_pipeline(repo_url=repo_url, max_files=3)
 
     except Exception as e:
         print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
+    # Headless: `python main.py --batch repos.txt [options]` (see app/chains/batch.py)
+    if sys.argv[1:2] == ["--batch"]:
+        from app.chains.batch import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
     main()
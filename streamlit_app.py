@@ -1,19 +1,97 @@
-# ✅ Fix for torch.classes crash on Streamlit reload
-from app.utils.torch_patch import *
-
-
 import streamlit as st
-import os
-import io
-import contextlib
 
-from app.utils.github import download_github_repo
-from app.agents.analyzer import AnalyzerAgent
-from app.agents.documenter import DocumenterAgent
-from app.agents.qa_agent import QAAgent
-from app.agents.tester_agent import TesterAgent
-from app.agents.readme_agent import ReadmeAgent
-from app.utils.pdf_exporter import generate_pdf_report
+# Heavy dependencies (langchain, chromadb, torch) load in the job threads, on
+# first use by the stage that needs them; the torch.classes workaround for
+# Streamlit reloads is applied when (and if) the torch backend is loaded.
+from app.chains.jobs import JobManager
+from app.utils.telemetry import setup_telemetry
+
+# No-op unless TELEMETRY_EXPORTER is set; safe to call on every rerun
+setup_telemetry()
+
+# UI agent name -> pipeline agent kind
+AGENT_KINDS = {"Analyzer": "analyzer", "Documenter": "documenter", "QA": "qa", "Tester": "tester", "README": "readme"}
+
+# Pipeline stage -> (report section, code language); stages not listed aren't rendered
+STAGE_SECTIONS = {
+    "analyzer": ("🧠 Analyzer Output", "markdown"),
+    "docstrings": ("📘 Documenter Output", "markdown"),
+    "summary": ("📘 File-level Summary", "markdown"),
+    "qa": ("🧪 QA Review", "markdown"),
+    "tester": ("🧬 Generated Tests", "python"),
+    "readme": ("📄 Generated README", "markdown"),
+}
+
+STATUS_ICONS = {"ok": "✅", "failed": "❌", "skipped": "⏭️"}
+
+
+@st.cache_resource
+def get_job_manager():
+    """One job runner per server process: shared by every session, it owns the cached agents."""
+    return JobManager()
+
+
+def render_job(job):
+    st.markdown(f"**Job `{job['id']}`** · `{job['repo_url']}` · {job['status']}")
+    st.progress(JobManager.progress(job))
+
+    for event in job["events"]:
+        detail = f" — {event['error']}" if event["error"] else ""
+        st.caption(f"{STATUS_ICONS.get(event['status'], '•')} {event['title']} ({event['seconds']}s){detail}")
+
+    index_stats = job["outputs"].get("index")
+    if isinstance(index_stats, dict):
+        st.caption(f"🗂️ Indexed: +{index_stats['added']} / -{index_stats['deleted']} / "
+                   f"={index_stats['unchanged']} blocks")
+
+    # Stages that didn't finish (failed or interrupted job) still have the block results this job stored
+    active = job["status"] in ("queued", "running")
+    store = get_job_manager().store
+    sections = {}
+    if not active and store is not None and job.get("repo"):
+        sections = store.sections(job["repo"], job["commit"], job["agents"] + ["summary"], run=job["id"])
+
+    report = {}
+    for stage in job["stages"]:
+        if stage not in STAGE_SECTIONS:
+            continue
+        title, language = STAGE_SECTIONS[stage]
+        finished = isinstance(job["outputs"].get(stage), str)
+        output = job["outputs"].get(stage) if finished else sections.get(title)
+        blocks = job.get("blocks", {}).get(stage) or []
+        if not isinstance(output, str):
+            # Per-block stages publish each result as it is ready: show what has arrived so far
+            if not blocks:
+                continue
+            output = "\n".join(blocks)
+        if finished:
+            label = title
+        elif active:
+            label = f"{title} (in progress: {len(blocks)} blocks)"
+        else:
+            label = f"{title} (partial)"
+        with st.expander(label, expanded=finished or active):
+            st.code(output, language=language)
+        report[title] = output
+
+    if job["status"] == "failed" and job["error"]:
+        st.error(f"❌ Error during pipeline execution:\n\n{job['error']}")
+    elif job["status"] == "interrupted":
+        st.warning("⚠️ The server restarted while this job was running; results above are partial.")
+
+    # 📄 Download PDF Report
+    if report and job["status"] == "done":
+        from app.utils.pdf_exporter import generate_pdf_report
+
+        with st.expander("📥 Download Report"):
+            pdf_path = generate_pdf_report(report)
+            with open(pdf_path, "rb") as f:
+                st.download_button(
+                    label="📄 Download Full Report (PDF)",
+                    data=f,
+                    file_name="codebase_report.pdf",
+                    mime="application/pdf"
+                )
 
 
 # Streamlit UI setup
@@ -21,97 +99,37 @@ st.set_page_config(page_title="Codebase Companion", layout="wide")
 st.title("🤖 Codebase Companion")
 st.markdown("A multi-agent system that reviews, documents, and tests your codebase using LLMs.")
 
+manager = get_job_manager()
+
 # Sidebar: Repo input + agent selection
 st.sidebar.title("📂 Analyze a GitHub Repo")
 repo_url = st.sidebar.text_input("🔗 GitHub Repo URL", placeholder="https://github.com/user/repo")
 run_all = st.sidebar.checkbox("✅ Run Full Pipeline", value=True)
 
-agent_options = ["Analyzer", "Documenter", "QA", "Tester", "README"]
+agent_options = list(AGENT_KINDS)
 selected_agents = agent_options if run_all else st.sidebar.multiselect("Select Agents to Run", agent_options)
 
-# Run button
+# Run button: the pipeline runs as a background job, so reruns and other sessions don't block on it
 if repo_url and st.sidebar.button("🚀 Run Analysis"):
-    with st.spinner("📥 Cloning repository and running agents..."):
-        try:
-            local_path = download_github_repo(repo_url)
-            st.success(f"✅ Repository cloned to: `{local_path}`")
-
-            # Store all outputs in a dict
-            output = {}
-
-            # === Analyzer Agent ===
-            if "Analyzer" in selected_agents:
-                with st.expander("🧠 Analyzer Output", expanded=True):
-                    agent = AnalyzerAgent()
-                    result = agent.analyze("Find logic issues or code smells")
-                    st.markdown(result)
-                    output["Analyzer Output"] = result
-
-            # === Documenter Agent ===
-            if "Documenter" in selected_agents:
-                with st.expander("📘 Documenter Output", expanded=True):
-                    agent = DocumenterAgent()
-
-                    # Function-level
-                    st.markdown("**Function-level docstrings:**")
-                    doc_buffer = io.StringIO()
-                    with contextlib.redirect_stdout(doc_buffer):
-                        agent.document_functions(code_dir=local_path, limit=3)
-                    doc_output = doc_buffer.getvalue()
-                    st.code(doc_output, language="markdown")
-                    output["Documenter Output"] = doc_output
-
-                    # File-level
-                    st.markdown("---")
-                    st.markdown("**File-level summary:**")
-                    py_files = [f for f in os.listdir(local_path) if f.endswith(".py")]
-                    if py_files:
-                        agent.summarize_file(filepath=os.path.join(local_path, py_files[0]))
-
-            # === QA Agent ===
-            if "QA" in selected_agents:
-                with st.expander("🧪 QA Review", expanded=True):
-                    agent = QAAgent()
-                    qa_buffer = io.StringIO()
-                    with contextlib.redirect_stdout(qa_buffer):
-                        agent.review_codebase(code_dir=local_path, max_files=3)
-                    qa_output = qa_buffer.getvalue()
-                    st.code(qa_output, language="markdown")
-                    output["QA Review"] = qa_output
-
-            # === Tester Agent ===
-            if "Tester" in selected_agents:
-                with st.expander("🧬 Generated Tests", expanded=True):
-                    agent = TesterAgent()
-                    test_buffer = io.StringIO()
-                    with contextlib.redirect_stdout(test_buffer):
-                        agent.generate_tests(code_dir=local_path, max_files=2)
-                    test_output = test_buffer.getvalue()
-                    st.code(test_output, language="python")
-                    output["Generated Tests"] = test_output
-
-            # === README Agent ===
-            if "README" in selected_agents:
-                with st.expander("📄 Generated README", expanded=True):
-                    agent = ReadmeAgent()
-                    result = agent.generate_readme(code_dir=local_path)
-                    st.code(result, language="markdown")
-                    output["Generated README"] = result
-                    
-            # 📄 Download PDF Report
-            if output:
-                with st.expander("📥 Download Report"):
-                    pdf_path = generate_pdf_report(output)
-                    with open(pdf_path, "rb") as f:
-                        st.download_button(
-                            label="📄 Download Full Report (PDF)",
-                            data=f,
-                            file_name="codebase_report.pdf",
-                            mime="application/pdf"
-                        )
-
-        except Exception as e:
-            st.error(f"❌ Error during pipeline execution:\n\n{e}")
-
-
-
+    job_id = manager.submit(repo_url, agents=[AGENT_KINDS[a] for a in selected_agents])
+    st.session_state["job_id"] = job_id
+    st.query_params["job"] = job_id
+
+# Reattach: the job ID survives reruns (session state) and page reloads (URL)
+job_id = st.query_params.get("job") or st.session_state.get("job_id")
+job = manager.get(job_id) if job_id else None
+
+if job_id and job is None:
+    st.warning(f"⚠️ Unknown job: {job_id}")
+elif job is not None:
+    # Poll while the job is active; a finished job is rendered once
+    running = job["status"] in ("queued", "running")
+
+    @st.fragment(run_every=2 if running else None)
+    def job_panel():
+        current = manager.get(job_id)
+        render_job(current)
+        if running and current["status"] not in ("queued", "running"):
+            st.rerun()
+
+    job_panel()